@@ -1,9 +1,37 @@
-from flask import Flask, request, render_template, redirect, url_for, session, flash, jsonify
+from flask import (Flask, request, render_template, redirect, url_for, session, flash, jsonify, g,
+                   has_app_context, has_request_context, abort)
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
 import sqlite3
 import datetime
 import os
+import queue
+import threading
+import collections
+import uuid
+import time
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool as BrokenExecutor
+import json
+import base64
+import re
+import html
+import io
+import csv
+import gzip
+import hashlib
+import mimetypes
+import bisect
+import heapq
+import functools
+from contextlib import closing, contextmanager
+import click
+
+try:
+    import brotli  # optional: adds "br" next to gzip for static files and API responses
+except ImportError:
+    brotli = None
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 app = Flask(
@@ -19,95 +47,1892 @@ app.permanent_session_lifetime = datetime.timedelta(days=14)
 TASK_DB = os.path.join(BASE_DIR, "tasks.db")
 ACCOUNTS_DB = os.path.join(BASE_DIR, "accounts.db")
 
+# --- Connection pool ---
+# connections are reused instead of opening a new one for every statement.
+# each request checks out at most one connection per db file and gives it back on teardown
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+DB_STATEMENT_CACHE = int(os.environ.get("DB_STATEMENT_CACHE", 256))
+DB_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-8000",  # ~8MB page cache per connection
+    "PRAGMA mmap_size=67108864",  # 64MB
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Times every execute/executemany and hands it to record_sql (see Instrumentation)."""
+
+    def __init__(self, database, *args, **kwargs):
+        super().__init__(database, *args, **kwargs)
+        self.db_name = os.path.basename(database)
+        self.instrumented = False  # switched on after the connect time PRAGMAs
+
+    def execute(self, sql, parameters=()):
+        if not self.instrumented:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_sql(self.db_name, sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_sql(self.db_name, sql, seq_of_parameters, time.perf_counter() - start, many=True)
+
+
+class ConnectionPool:
+    # sqlite3.Connection subclass to create, bench/ swaps in a subclass to count statements
+    connection_class = InstrumentedConnection
+
+    def __init__(self, db_file, size=DB_POOL_SIZE):
+        self.db_file = db_file
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        # check_same_thread=False because a pooled connection can be handed to another
+        # thread later on, but it is only ever used by one thread at a time
+        conn = sqlite3.connect(self.db_file, check_same_thread=False,
+                               cached_statements=DB_STATEMENT_CACHE, factory=self.connection_class)
+        conn.row_factory = sqlite3.Row
+        for pragma in DB_PRAGMAS:
+            conn.execute(pragma)
+        conn.instrumented = True
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn):
+        # never hand out a connection with a half finished transaction
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+
+def get_pool(db_file):
+    pool = _pools.get(db_file)
+    if pool is None:
+        pool = _pools.setdefault(db_file, ConnectionPool(db_file))
+    return pool
+
+def close_pools():
+    for pool in list(_pools.values()):
+        pool.close_all()
+    _pools.clear()
+
+def get_conn(db_file):
+    """Connection for db_file bound to the current request (only valid inside an app context)."""
+    conns = g.setdefault("_db_conns", {})
+    conn = conns.get(db_file)
+    if conn is None:
+        conn = conns[db_file] = get_pool(db_file).acquire()
+    return conn
+
+@app.teardown_appcontext
+def release_db_conns(exc):
+    conns = g.pop("_db_conns", None) or {}
+    for db_file, conn in conns.items():
+        get_pool(db_file).release(conn)
+
+
 # --- Helpers ---
 def query_db(db_file, query, args=(), one=False):
-    with sqlite3.connect(db_file) as conn:
-        conn.row_factory = sqlite3.Row
-        cur = conn.execute(query, args)
-        rows = cur.fetchall()
-        conn.commit()
+    if has_app_context():
+        rows = _run(get_conn(db_file), query, args)
+    else:
+        # e.g. scripts or background work: borrow a connection just for this statement
+        pool = get_pool(db_file)
+        conn = pool.acquire()
+        try:
+            rows = _run(conn, query, args)
+        finally:
+            pool.release(conn)
+    return (rows[0] if rows else None) if one else rows
+
+def _run(conn, query, args):
+    if conn.in_transaction:
+        # inside db_transaction/db_snapshot, whoever opened it commits
+        return _fetch(conn, query, args)
+    with conn:
+        return _fetch(conn, query, args)
+
+def _fetch(conn, query, args):
+    cur = conn.execute(query, args)
+    start = time.perf_counter()
+    rows = cur.fetchall()
+    add_fetch_time(time.perf_counter() - start)
+    return rows
+
+@contextmanager
+def db_transaction(db_file):
+    """Yield a connection with an open write transaction (BEGIN IMMEDIATE) on db_file.
+    Commits when the block finishes, rolls back if it raises."""
+    if has_app_context():
+        conn, pool = get_conn(db_file), None
+    else:
+        pool = get_pool(db_file)
+        conn = pool.acquire()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        with conn:
+            yield conn
+    finally:
+        if pool:
+            pool.release(conn)
+
+# --- Write queue ---
+# optional (WRITE_QUEUE=1): the writes of the task, list and member routes go to one writer
+# thread per db file instead of every request committing on its own. the writer takes what's
+# queued, up to WRITE_BATCH_SIZE, and runs it as one BEGIN IMMEDIATE transaction, each write
+# in its own SAVEPOINT so a failing one only undoes itself. a batch is whatever piled up while
+# the previous commit ran; WRITE_BATCH_WINDOW_MS > 0 also waits that long for more, which only
+# adds latency when it's quiet (see bench/write_queue.py). requests wait on a future that
+# resolves after the COMMIT, so nothing is acknowledged before it's written, and request
+# threads never queue on sqlite's write lock
+WRITE_QUEUE = os.environ.get("WRITE_QUEUE", "0") == "1"
+WRITE_BATCH_SIZE = int(os.environ.get("WRITE_BATCH_SIZE", 64))
+WRITE_BATCH_WINDOW_MS = float(os.environ.get("WRITE_BATCH_WINDOW_MS", 0))
+# longest a request waits for its queued write before giving up with a 503
+WRITE_TIMEOUT = float(os.environ.get("WRITE_TIMEOUT", 30))
+
+
+class WriteTimeout(sqlite3.OperationalError):
+    """The write queue didn't get to a write in time. An OperationalError like "database is
+    locked", so code that copes with that copes with this too."""
+
+
+class WriteQueue:
+    def __init__(self, db_file, batch_size=WRITE_BATCH_SIZE, window_ms=WRITE_BATCH_WINDOW_MS):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.window = window_ms / 1000
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, fn):
+        """Run fn(conn) in the next group transaction. Returns a Future with its result."""
+        future = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"writer {os.path.basename(self.db_file)}",
+                                                daemon=True)
+                self._thread.start()
+            self._queue.put((fn, future))
+        return future
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # finish this batch, stop on the next get()
+                    break
+                batch.append(item)
+            # skip writes whose request gave up waiting (write_transaction cancelled them)
+            batch = [(fn, future) for fn, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+            try:
+                self._commit(batch)
+            except Exception as e:
+                # never leave a request waiting, and keep the writer alive for the next batch
+                app.logger.exception("write batch failed")
+                for _fn, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _commit(self, batch):
+        pool, conn = get_pool(self.db_file), None
+        start = time.perf_counter()
+        results = []
+        try:
+            conn = pool.acquire()
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                # marked running only now, so a write still waiting its turn can be cancelled
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT write")
+                try:
+                    results.append((future, fn(conn), None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    results.append((future, None, e))
+                conn.execute("RELEASE write")
+            conn.commit()
+        except Exception as e:
+            # no connection, or BEGIN or COMMIT failed (e.g. locked by another process past
+            # busy_timeout): nothing of this batch was written
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            for _fn, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            if conn is not None:
+                pool.release(conn)
+        elapsed = time.perf_counter() - start
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        metrics.observe_write_batch(conn.db_name, len(batch), elapsed)
+
+
+_write_queues = {}
+_write_queues_lock = threading.Lock()
+
+def get_write_queue(db_file):
+    with _write_queues_lock:
+        wq = _write_queues.get(db_file)
+        if wq is None:
+            wq = _write_queues[db_file] = WriteQueue(db_file)
+        return wq
+
+def stop_write_queues():
+    with _write_queues_lock:
+        queues = list(_write_queues.values())
+        _write_queues.clear()
+    for wq in queues:
+        wq.stop()
+
+def write_transaction(db_file, fn):
+    """Run fn(conn) in a write transaction and return its result: through the write queue
+    when WRITE_QUEUE is on, else in a db_transaction of its own."""
+    if WRITE_QUEUE:
+        future = get_write_queue(db_file).submit(fn)
+        try:
+            return future.result(timeout=WRITE_TIMEOUT)
+        except FutureTimeout:
+            # still queued: cancelled, it never runs. already running: it's inside a
+            # transaction that ends within busy_timeout, give it one more round
+            if not future.cancel():
+                try:
+                    return future.result(timeout=WRITE_TIMEOUT)
+                except FutureTimeout:
+                    pass
+            raise WriteTimeout("write queue timed out")
+    with db_transaction(db_file) as conn:
+        return fn(conn)
+
+def write_db(db_file, query, args=(), one=False):
+    """query_db for a single write statement, queued when WRITE_QUEUE is on."""
+    if not WRITE_QUEUE:
+        return query_db(db_file, query, args, one)
+    rows = write_transaction(db_file, lambda conn: _fetch(conn, query, args))
     return (rows[0] if rows else None) if one else rows
 
+# --- Instrumentation ---
+# every statement run on a pooled connection during a request lands in g._sql as
+# [db file, sql, seconds, params, executemany?]. after_request turns that into a Server-Timing
+# header, folds it into the /metrics histograms and logs statements slower than SLOW_QUERY_MS.
+# the per statement cost is one perf_counter pair and a list append
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 100))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")  # if set /metrics wants "Authorization: Bearer <token>"
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+@functools.lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """One line, IN (?, ?, ...) lists folded so batch sizes don't make new statements."""
+    return _IN_LIST.sub("IN (...)", _WHITESPACE.sub(" ", sql).strip())
+
+def param_shape(params, many=False):
+    """Types of the bound parameters, never the values, e.g. "(int, str)" or "3 x (int)"."""
+    if many:
+        rows = params if isinstance(params, (list, tuple)) else None
+        first = param_shape(rows[0]) if rows else "()"
+        return f"{len(rows) if rows is not None else '?'} x {first}"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {'None' if v is None else type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join("None" if v is None else type(v).__name__ for v in params) + ")"
+
+def current_route():
+    rule = request.url_rule if has_request_context() else None
+    return rule.rule if rule else "-"
+
+def record_sql(db_name, sql, params, elapsed, many=False):
+    if many:
+        # keep the shape, not the rows: an import would otherwise pin every chunk until the end
+        params = param_shape(params, many=True)
+    stats = g.get("_sql") if has_app_context() else None
+    if stats is not None:
+        stats.append([db_name, sql, elapsed, params, many])
+    elif elapsed * 1000 >= SLOW_QUERY_MS:
+        # outside the request lifecycle (scripts, background work, streamed responses)
+        log_slow_query(current_route(), db_name, sql, params, many, elapsed)
+
+def add_fetch_time(elapsed):
+    """Charge fetchall() time to the statement that was just executed."""
+    stats = g.get("_sql") if has_app_context() else None
+    if stats:
+        stats[-1][2] += elapsed
+
+def log_slow_query(route, db_name, sql, params, many, elapsed):
+    metrics.observe_slow_query(db_name)
+    app.logger.warning("slow query %.1fms [%s] %s: %s params=%s", elapsed * 1000, db_name, route,
+                       normalize_sql(sql), params if many else param_shape(params))
+
+
+def _labels(names, values):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, labels
+        self._series = collections.defaultdict(float)
+
+    def inc(self, *label_values, amount=1):
+        self._series[label_values] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self._series.items()):
+            lines.append(f"{self.name}{{{_labels(self.labels, values)}}} {total:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name, self.help, self.buckets, self.labels = name, help, buckets, labels
+        self._series = {}  # label values -> [per bucket counts (+overflow), sum, count]
+
+    def observe(self, value, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, (counts, total, count) in sorted(self._series.items()):
+            labels = _labels(self.labels, values)
+            prefix = labels + "," if labels else ""
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class Metrics:
+    """Process wide aggregates, updated once per request under a single lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter("http_requests_total", "Requests by route and status",
+                                ("method", "route", "status"))
+        self.request_seconds = Histogram("http_request_duration_seconds", "Request handling time",
+                                         LATENCY_BUCKETS, ("route",))
+        self.request_sql_seconds = Histogram("sql_request_duration_seconds", "SQL time per request",
+                                             LATENCY_BUCKETS, ("route",))
+        self.request_statements = Histogram("sql_statements_per_request", "SQL statements per request",
+                                            STATEMENT_BUCKETS, ("route",))
+        self.statement_seconds = Histogram("sql_statement_duration_seconds", "Time per SQL statement",
+                                           LATENCY_BUCKETS, ("db",))
+        self.statement_calls = Counter("sql_statement_calls_total", "Executions per normalized statement",
+                                       ("db", "statement"))
+        self.statement_total = Counter("sql_statement_seconds_total", "Time per normalized statement",
+                                       ("db", "statement"))
+        self.slow_queries = Counter("sql_slow_queries_total", f"Statements over {SLOW_QUERY_MS:g}ms",
+                                    ("db",))
+        self.write_batch_size = Histogram("sql_write_batch_size", "Writes per group commit (WRITE_QUEUE)",
+                                          STATEMENT_BUCKETS, ("db",))
+        self.write_batch_seconds = Histogram("sql_write_batch_duration_seconds",
+                                             "Time per group commit transaction (WRITE_QUEUE)",
+                                             LATENCY_BUCKETS, ("db",))
+
+    def observe_request(self, method, route, status, elapsed, stats):
+        with self._lock:
+            self.requests.inc(method, route, str(status))
+            self.request_seconds.observe(elapsed, route)
+            self.request_statements.observe(len(stats), route)
+            self.request_sql_seconds.observe(sum(s[2] for s in stats), route)
+            for db_name, sql, seconds, _params, _many in stats:
+                statement = normalize_sql(sql)
+                self.statement_seconds.observe(seconds, db_name)
+                self.statement_calls.inc(db_name, statement)
+                self.statement_total.inc(db_name, statement, amount=seconds)
+
+    def observe_slow_query(self, db_name):
+        with self._lock:
+            self.slow_queries.inc(db_name)
+
+    def observe_write_batch(self, db_name, size, elapsed):
+        with self._lock:
+            self.write_batch_size.observe(size, db_name)
+            self.write_batch_seconds.observe(elapsed, db_name)
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.request_seconds, self.request_sql_seconds,
+                           self.request_statements, self.statement_seconds, self.statement_calls,
+                           self.statement_total, self.slow_queries, self.write_batch_size,
+                           self.write_batch_seconds):
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+@app.before_request
+def start_request_instrumentation():
+    g._request_start = time.perf_counter()
+    g._sql = []
+
+@app.after_request
+def finish_request_instrumentation(response):
+    start = g.pop("_request_start", None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    stats = g.pop("_sql", [])
+    route = current_route()
+
+    per_db = {}
+    for db_name, sql, seconds, params, many in stats:
+        count, total = per_db.get(db_name, (0, 0.0))
+        per_db[db_name] = (count + 1, total + seconds)
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            log_slow_query(route, db_name, sql, params, many, seconds)
+    timing = [f'{db_name.rsplit(".", 1)[0]};dur={total * 1000:.2f};desc="{count} sql"'
+              for db_name, (count, total) in per_db.items()]
+    timing.append(f"total;dur={elapsed * 1000:.2f}")
+    response.headers["Server-Timing"] = ", ".join(timing)
+
+    metrics.observe_request(request.method, route, response.status_code, elapsed, stats)
+    return response
+
+
+@contextmanager
+def db_snapshot(db_file):
+    """Run several query_db reads on db_file against one consistent snapshot (a deferred read
+    transaction on the request's connection). Only valid inside an app context."""
+    conn = get_conn(db_file)
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.rollback()  # nothing was written, just ends the read transaction
+
+# --- Schema ---
+# each db keeps its schema version in PRAGMA user_version. migrations run once, in order,
+# each inside its own transaction. only ever append new steps to the end of a list
+def migrate(conn, migrations):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, step in enumerate(migrations[version:], start=version + 1):
+        conn.execute("BEGIN")
+        try:
+            if callable(step):
+                step(conn)
+            else:
+                for stmt in step:
+                    conn.execute(stmt)
+            conn.execute(f"PRAGMA user_version={target}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return version
+
+def _tasks_v1(conn):
+    # base schema. dbs from before versioning may be missing user_id / list_id on tasks
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            list_id INTEGER,
+            title TEXT NOT NULL,
+            description TEXT,
+            dueDate TEXT,
+            dueTime TEXT,
+            priority TEXT,
+            done INTEGER DEFAULT 0,
+            createdAt TEXT
+        )
+    """)
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+    if 'user_id' not in cols:
+        conn.execute("ALTER TABLE tasks ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1")
+    if 'list_id' not in cols:
+        conn.execute("ALTER TABLE tasks ADD COLUMN list_id INTEGER")
+
+    # make the collab lists
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lists (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            is_collab INTEGER DEFAULT 1
+        )
+    """)
+    # UNIQUE(list_id, user_id) doubles as the index for is_member
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS list_members (
+            list_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            UNIQUE(list_id, user_id)
+        )
+    """)
+
+# list_stats / list_stats_due key every task by scope: (list_id, 0) for list tasks,
+# (0, user_id) for someone's personal tasks. row is "NEW.", "OLD." or "" (plain table scan)
+def _stats_scope(row):
+    return f"IFNULL({row}list_id, 0), CASE WHEN {row}list_id IS NULL THEN {row}user_id ELSE 0 END"
+
+def _stats_match(row):
+    return (f"list_id = IFNULL({row}list_id, 0) AND "
+            f"user_id = CASE WHEN {row}list_id IS NULL THEN {row}user_id ELSE 0 END")
+
+def _stats_due(row):
+    # "YYYY-MM-DDTHH:MM" so it compares as text with now, no time means end of that day
+    return f"(NULLIF({row}dueDate, '') || 'T' || IFNULL(NULLIF({row}dueTime, ''), '23:59'))"
+
+def _stats_add(row):
+    return f"""
+        INSERT INTO list_stats (list_id, user_id, total, done)
+        VALUES ({_stats_scope(row)}, 1, IFNULL({row}done, 0) != 0)
+        ON CONFLICT (list_id, user_id) DO UPDATE SET total = total + 1, done = done + excluded.done;
+        INSERT INTO list_stats_due (list_id, user_id, due, open)
+        SELECT {_stats_scope(row)}, {_stats_due(row)}, 1
+        WHERE {_stats_due(row)} IS NOT NULL AND IFNULL({row}done, 0) = 0
+        ON CONFLICT (list_id, user_id, due) DO UPDATE SET open = open + 1;
+    """
+
+def _stats_remove(row):
+    return f"""
+        UPDATE list_stats SET total = total - 1, done = done - (IFNULL({row}done, 0) != 0)
+        WHERE {_stats_match(row)};
+        UPDATE list_stats_due SET open = open - 1
+        WHERE {_stats_match(row)} AND due = {_stats_due(row)} AND IFNULL({row}done, 0) = 0;
+        DELETE FROM list_stats_due WHERE {_stats_match(row)} AND due = {_stats_due(row)} AND open <= 0;
+    """
+
+# dueDate/dueTime (local time, free-form text) as unix seconds, NULL when there's no usable
+# date. an unparseable time falls back to the end of the day, like _stats_due
+def _due_at(row):
+    date = f"NULLIF({row}dueDate, '')"
+    return (f"CAST(COALESCE(strftime('%s', {date} || ' ' || NULLIF({row}dueTime, ''), 'utc'), "
+            f"strftime('%s', {date} || ' 23:59', 'utc')) AS INTEGER)")
+
+# open tasks with a due time, the condition of the partial due_at indexes. queries have to
+# spell it exactly like this or sqlite won't use them
+DUE_OPEN = "due_at IS NOT NULL AND IFNULL(done, 0) = 0"
+
+LIST_STATS_REBUILD = (
+    "DELETE FROM list_stats",
+    f"INSERT INTO list_stats (list_id, user_id, total, done) "
+    f"SELECT {_stats_scope('')}, COUNT(*), SUM(IFNULL(done, 0) != 0) FROM tasks GROUP BY 1, 2",
+    "DELETE FROM list_stats_due",
+    f"INSERT INTO list_stats_due (list_id, user_id, due, open) "
+    f"SELECT {_stats_scope('')}, {_stats_due('')}, COUNT(*) FROM tasks "
+    f"WHERE {_stats_due('')} IS NOT NULL AND IFNULL(done, 0) = 0 GROUP BY 1, 2, 3",
+)
+
+# list_stats counts archived tasks too: archiving doesn't change what a list holds. they are
+# all done, so list_stats_due never has them. (v6 above predates tasks_archive)
+_STATS_TASKS = "(SELECT user_id, list_id, done FROM tasks UNION ALL SELECT user_id, list_id, done FROM tasks_archive)"
+LIST_STATS_RECOUNT = (f"SELECT {_stats_scope('')}, COUNT(*), SUM(IFNULL(done, 0) != 0) "
+                      f"FROM {_STATS_TASKS} GROUP BY 1, 2")
+LIST_STATS_REBUILD_ALL = (
+    "DELETE FROM list_stats",
+    f"INSERT INTO list_stats (list_id, user_id, total, done) {LIST_STATS_RECOUNT}",
+    *LIST_STATS_REBUILD[2:],
+)
+
+# triggers that shouldn't see rows moving between tasks and tasks_archive (archive_batch,
+# restore_archived set archive_state.moving around the move)
+NOT_ARCHIVE_MOVE = "(SELECT moving FROM archive_state WHERE id = 1) = 0"
+
+TASK_MIGRATIONS = [
+    _tasks_v1,
+    # v2: indexes for the task/list access paths
+    (
+        # personal tasks: user_id=? AND list_id IS NULL
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_list ON tasks(user_id, list_id)",
+        # collab list tasks: list_id=?
+        "CREATE INDEX IF NOT EXISTS idx_tasks_list ON tasks(list_id)",
+        # GET /lists joins list_members on user_id
+        "CREATE INDEX IF NOT EXISTS idx_list_members_user ON list_members(user_id, list_id)",
+        "CREATE INDEX IF NOT EXISTS idx_lists_owner ON lists(owner_id, name)",
+    ),
+    # v3: one index per (scope, sort key) so GET /tasks pages straight off an index.
+    # the expressions must match TASK_SORT_KEYS exactly
+    (
+        # personal tasks used to be stored with list_id='' sometimes, normalize so
+        # "list_id IS NULL" can use the index
+        "UPDATE tasks SET list_id=NULL WHERE list_id=''",
+        "DROP INDEX IF EXISTS idx_tasks_user_list",
+        "DROP INDEX IF EXISTS idx_tasks_list",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks(user_id, list_id, IFNULL(createdAt, ''))",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_due ON tasks(user_id, list_id, IFNULL(dueDate, ''))",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_priority ON tasks(user_id, list_id, "
+        "CASE priority WHEN 'High' THEN 0 WHEN 'Mid' THEN 1 ELSE 2 END)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_list_created ON tasks(list_id, IFNULL(createdAt, ''))",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_list_due ON tasks(list_id, IFNULL(dueDate, ''))",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_list_priority ON tasks(list_id, "
+        "CASE priority WHEN 'High' THEN 0 WHEN 'Mid' THEN 1 ELSE 2 END)",
+    ),
+    # v4: change tracking for delta sync. every insert/update/delete bumps one global
+    # counter and stamps the row (or a tombstone) with it, so GET /tasks?since=<seq>
+    # only has to look at rows with version > seq
+    (
+        "ALTER TABLE tasks ADD COLUMN version INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE tasks ADD COLUMN updated_at TEXT",
+        "UPDATE tasks SET updated_at = createdAt",
+        "CREATE TABLE IF NOT EXISTS sync_counter (id INTEGER PRIMARY KEY CHECK (id = 1), seq INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO sync_counter (id, seq) VALUES (1, 0)",
+        """
+        CREATE TABLE IF NOT EXISTS task_tombstones (
+            task_id INTEGER NOT NULL,
+            user_id INTEGER,
+            list_id INTEGER,
+            version INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_version ON tasks(user_id, list_id, version)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_list_version ON tasks(list_id, version)",
+        "CREATE INDEX IF NOT EXISTS idx_tombstones_user ON task_tombstones(user_id, list_id, version)",
+        "CREATE INDEX IF NOT EXISTS idx_tombstones_list ON task_tombstones(list_id, version)",
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_sync_insert AFTER INSERT ON tasks BEGIN
+            UPDATE sync_counter SET seq = seq + 1 WHERE id = 1;
+            UPDATE tasks SET version = (SELECT seq FROM sync_counter WHERE id = 1),
+                             updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')
+            WHERE id = NEW.id;
+        END
+        """,
+        # version/updated_at are left out of the column list so the trigger's own
+        # UPDATE doesn't fire it again
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_sync_update
+        AFTER UPDATE OF user_id, list_id, title, description, dueDate, dueTime, priority, done ON tasks BEGIN
+            UPDATE sync_counter SET seq = seq + 1 WHERE id = 1;
+            UPDATE tasks SET version = (SELECT seq FROM sync_counter WHERE id = 1),
+                             updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')
+            WHERE id = NEW.id;
+        END
+        """,
+        # a task moved to another list (or person) is a delete as far as the old scope goes
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_sync_move AFTER UPDATE OF user_id, list_id ON tasks
+        WHEN OLD.list_id IS NOT NEW.list_id OR (NEW.list_id IS NULL AND OLD.user_id IS NOT NEW.user_id)
+        BEGIN
+            UPDATE sync_counter SET seq = seq + 1 WHERE id = 1;
+            INSERT INTO task_tombstones (task_id, user_id, list_id, version)
+            VALUES (OLD.id, OLD.user_id, OLD.list_id, (SELECT seq FROM sync_counter WHERE id = 1));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_sync_delete AFTER DELETE ON tasks BEGIN
+            UPDATE sync_counter SET seq = seq + 1 WHERE id = 1;
+            INSERT INTO task_tombstones (task_id, user_id, list_id, version)
+            VALUES (OLD.id, OLD.user_id, OLD.list_id, (SELECT seq FROM sync_counter WHERE id = 1));
+        END
+        """,
+    ),
+    # v5: full text search. tasks_fts indexes title/description plus a "scope" token
+    # (u<user_id> for personal tasks, l<list_id> for list tasks) so the visibility filter is
+    # part of the MATCH and never touches other people's rows. external content: the text
+    # itself stays in tasks, read through tasks_search_source for snippets/rebuilds
+    (
+        """
+        CREATE VIEW IF NOT EXISTS tasks_search_source AS
+        SELECT id, title, description,
+               CASE WHEN list_id IS NULL THEN 'u' || user_id ELSE 'l' || list_id END AS scope
+        FROM tasks
+        """,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, description, scope,
+            content='tasks_search_source', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title, description, scope)
+            VALUES (NEW.id, NEW.title, NEW.description,
+                    CASE WHEN NEW.list_id IS NULL THEN 'u' || NEW.user_id ELSE 'l' || NEW.list_id END);
+        END
+        """,
+        # external content tables need the old values to remove a row from the index
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description, scope)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description,
+                    CASE WHEN OLD.list_id IS NULL THEN 'u' || OLD.user_id ELSE 'l' || OLD.list_id END);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update
+        AFTER UPDATE OF title, description, user_id, list_id ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description, scope)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description,
+                    CASE WHEN OLD.list_id IS NULL THEN 'u' || OLD.user_id ELSE 'l' || OLD.list_id END);
+            INSERT INTO tasks_fts (rowid, title, description, scope)
+            VALUES (NEW.id, NEW.title, NEW.description,
+                    CASE WHEN NEW.list_id IS NULL THEN 'u' || NEW.user_id ELSE 'l' || NEW.list_id END);
+        END
+        """,
+        # backfill everything that was there before the triggers
+        "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')",
+    ),
+    # v6: per list (and per personal bucket) counters for GET /lists. overdue/next due depend
+    # on the clock, so instead of storing them list_stats_due keeps the number of open tasks
+    # per due minute and GET /lists sums/mins over that (O(due dates), not O(tasks))
+    (
+        """
+        CREATE TABLE IF NOT EXISTS list_stats (
+            list_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (list_id, user_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS list_stats_due (
+            list_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            due TEXT NOT NULL,
+            open INTEGER NOT NULL,
+            PRIMARY KEY (list_id, user_id, due)
+        ) WITHOUT ROWID
+        """,
+        f"CREATE TRIGGER IF NOT EXISTS list_stats_insert AFTER INSERT ON tasks BEGIN {_stats_add('NEW.')} END",
+        f"CREATE TRIGGER IF NOT EXISTS list_stats_delete AFTER DELETE ON tasks BEGIN {_stats_remove('OLD.')} END",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS list_stats_update
+        AFTER UPDATE OF user_id, list_id, done, dueDate, dueTime ON tasks BEGIN
+            {_stats_remove('OLD.')}
+            {_stats_add('NEW.')}
+        END
+        """,
+        *LIST_STATS_REBUILD,
+    ),
+    # v7: due_at, the due date/time as an integer so "what's due next" is an index range
+    # instead of string juggling. kept up to date by triggers (the extra UPDATE only touches
+    # due_at, which none of the other UPDATE OF triggers listen to). the indexes only hold
+    # open tasks with a due time: per scope for /tasks/upcoming and /tasks/overdue, plus a
+    # global one the reminder scheduler walks
+    (
+        "ALTER TABLE tasks ADD COLUMN due_at INTEGER",
+        f"UPDATE tasks SET due_at = {_due_at('')} WHERE NULLIF(dueDate, '') IS NOT NULL",
+        f"CREATE INDEX IF NOT EXISTS idx_tasks_user_due_at ON tasks(user_id, list_id, due_at) WHERE {DUE_OPEN}",
+        f"CREATE INDEX IF NOT EXISTS idx_tasks_list_due_at ON tasks(list_id, due_at) WHERE {DUE_OPEN}",
+        f"CREATE INDEX IF NOT EXISTS idx_tasks_due_at ON tasks(due_at) WHERE {DUE_OPEN}",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS tasks_due_at_insert AFTER INSERT ON tasks
+        WHEN NULLIF(NEW.dueDate, '') IS NOT NULL BEGIN
+            UPDATE tasks SET due_at = {_due_at('NEW.')} WHERE id = NEW.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS tasks_due_at_update AFTER UPDATE OF dueDate, dueTime ON tasks BEGIN
+            UPDATE tasks SET due_at = {_due_at('NEW.')} WHERE id = NEW.id;
+        END
+        """,
+    ),
+    # v8: archive tier. tasks done for more than ARCHIVE_AFTER_DAYS (by updated_at, which the
+    # sync triggers bump when done flips) move to tasks_archive so tasks and its indexes only
+    # hold active work. same ids and columns, plus the GET /tasks sort indexes so
+    # ?include_archived=1 pages the archive the same way
+    (
+        """
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            list_id INTEGER,
+            title TEXT NOT NULL,
+            description TEXT,
+            dueDate TEXT,
+            dueTime TEXT,
+            priority TEXT,
+            done INTEGER,
+            createdAt TEXT,
+            updated_at TEXT,
+            due_at INTEGER,
+            archived_at TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_archive_user_created ON tasks_archive(user_id, list_id, IFNULL(createdAt, ''))",
+        "CREATE INDEX IF NOT EXISTS idx_archive_user_due ON tasks_archive(user_id, list_id, IFNULL(dueDate, ''))",
+        "CREATE INDEX IF NOT EXISTS idx_archive_user_priority ON tasks_archive(user_id, list_id, "
+        "CASE priority WHEN 'High' THEN 0 WHEN 'Mid' THEN 1 ELSE 2 END)",
+        "CREATE INDEX IF NOT EXISTS idx_archive_list_created ON tasks_archive(list_id, IFNULL(createdAt, ''))",
+        "CREATE INDEX IF NOT EXISTS idx_archive_list_due ON tasks_archive(list_id, IFNULL(dueDate, ''))",
+        "CREATE INDEX IF NOT EXISTS idx_archive_list_priority ON tasks_archive(list_id, "
+        "CASE priority WHEN 'High' THEN 0 WHEN 'Mid' THEN 1 ELSE 2 END)",
+        # what the compactor walks: only done tasks, oldest change first
+        "CREATE INDEX IF NOT EXISTS idx_tasks_done_updated ON tasks(updated_at) WHERE IFNULL(done, 0) != 0",
+    ),
+    # v9: tombstone retention. tombstones get a timestamp so prune_tombstones can drop the
+    # ones older than SYNC_RETENTION_DAYS; sync_counter.horizon keeps the newest version
+    # dropped, a ?since= below it can't be answered from tombstones anymore. existing
+    # tombstones count as deleted now
+    (
+        "ALTER TABLE task_tombstones ADD COLUMN deleted_at TEXT",
+        "UPDATE task_tombstones SET deleted_at = strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')",
+        "CREATE INDEX IF NOT EXISTS idx_tombstones_deleted ON task_tombstones(deleted_at)",
+        "ALTER TABLE sync_counter ADD COLUMN horizon INTEGER NOT NULL DEFAULT 0",
+        "DROP TRIGGER IF EXISTS tasks_sync_move",
+        """
+        CREATE TRIGGER tasks_sync_move AFTER UPDATE OF user_id, list_id ON tasks
+        WHEN OLD.list_id IS NOT NEW.list_id OR (NEW.list_id IS NULL AND OLD.user_id IS NOT NEW.user_id)
+        BEGIN
+            UPDATE sync_counter SET seq = seq + 1 WHERE id = 1;
+            INSERT INTO task_tombstones (task_id, user_id, list_id, version, deleted_at)
+            VALUES (OLD.id, OLD.user_id, OLD.list_id, (SELECT seq FROM sync_counter WHERE id = 1),
+                    strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'));
+        END
+        """,
+        "DROP TRIGGER IF EXISTS tasks_sync_delete",
+        """
+        CREATE TRIGGER tasks_sync_delete AFTER DELETE ON tasks BEGIN
+            UPDATE sync_counter SET seq = seq + 1 WHERE id = 1;
+            INSERT INTO task_tombstones (task_id, user_id, list_id, version, deleted_at)
+            VALUES (OLD.id, OLD.user_id, OLD.list_id, (SELECT seq FROM sync_counter WHERE id = 1),
+                    strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'));
+        END
+        """,
+    ),
+    # v10: moving a task to or from the archive is neither a delete nor an insert as far as
+    # the list counters and delta sync go: those triggers skip rows while archive_state.moving
+    # is set. list_stats is recounted so tasks archived before this count again
+    (
+        "CREATE TABLE IF NOT EXISTS archive_state (id INTEGER PRIMARY KEY CHECK (id = 1), moving INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO archive_state (id, moving) VALUES (1, 0)",
+        "DROP TRIGGER IF EXISTS list_stats_insert",
+        f"CREATE TRIGGER list_stats_insert AFTER INSERT ON tasks WHEN {NOT_ARCHIVE_MOVE} "
+        f"BEGIN {_stats_add('NEW.')} END",
+        "DROP TRIGGER IF EXISTS list_stats_delete",
+        f"CREATE TRIGGER list_stats_delete AFTER DELETE ON tasks WHEN {NOT_ARCHIVE_MOVE} "
+        f"BEGIN {_stats_remove('OLD.')} END",
+        "DROP TRIGGER IF EXISTS tasks_sync_delete",
+        f"""
+        CREATE TRIGGER tasks_sync_delete AFTER DELETE ON tasks WHEN {NOT_ARCHIVE_MOVE} BEGIN
+            UPDATE sync_counter SET seq = seq + 1 WHERE id = 1;
+            INSERT INTO task_tombstones (task_id, user_id, list_id, version, deleted_at)
+            VALUES (OLD.id, OLD.user_id, OLD.list_id, (SELECT seq FROM sync_counter WHERE id = 1),
+                    strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'));
+        END
+        """,
+        *LIST_STATS_REBUILD_ALL,
+    ),
+]
+
+def _accounts_v1(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            name TEXT  NOT NULL,
+            security TEXT NOT NULL,
+            password_hash TEXT NOT NULL
+        )
+    """)
+    # older dbs may be missing 'name' and 'security'
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+    if 'name' not in cols:
+        conn.execute("ALTER TABLE users ADD COLUMN name TEXT")
+    if 'security' not in cols:
+        conn.execute("ALTER TABLE users ADD COLUMN security TEXT")
+
+ACCOUNT_MIGRATIONS = [
+    _accounts_v1,
+]
+
 def init_task_db():
-    with sqlite3.connect(TASK_DB) as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                list_id INTEGER,
-                title TEXT NOT NULL,
-                description TEXT,
-                dueDate TEXT,
-                dueTime TEXT,
-                priority TEXT,
-                done INTEGER DEFAULT 0,
-                createdAt TEXT
-            )
-        """)
-        # Lightweight migration: add user_id if missing
-        cur = conn.execute("PRAGMA table_info(tasks)")
-        cols = {row[1] for row in cur.fetchall()}
-        if 'user_id' not in cols:
-            conn.execute("ALTER TABLE tasks ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1")
-        if 'list_id' not in cols:
-            conn.execute("ALTER TABLE tasks ADD COLUMN list_id INTEGER")
-
-        # make the collab lists
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS lists (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                owner_id INTEGER NOT NULL,
-                name TEXT NOT NULL,
-                is_collab INTEGER DEFAULT 1
-            )
-        """)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS list_members (
-                list_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                UNIQUE(list_id, user_id)
-            )
-        """)
+    with closing(sqlite3.connect(TASK_DB, isolation_level=None)) as conn:
+        migrate(conn, TASK_MIGRATIONS)
+        # the compactor gives pages freed by archiving back with incremental_vacuum, which needs
+        # auto_vacuum=INCREMENTAL. switching an existing file over takes one full VACUUM
+        # (can't run inside a migration step's transaction)
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
 
 def init_accounts_db():
-    with sqlite3.connect(ACCOUNTS_DB) as conn:
-        # Create table if not exists (latest schema)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                name TEXT  NOT NULL,
-                security TEXT NOT NULL,
-                password_hash TEXT NOT NULL
-            )
-        """)
-        # Lightweight migration: ensure 'name' and 'security' columns exist for older DBs
-        cur = conn.execute("PRAGMA table_info(users)")
-        cols = {row[1] for row in cur.fetchall()}
-        if 'name' not in cols:
-            conn.execute("ALTER TABLE users ADD COLUMN name TEXT")
-        if 'security' not in cols:
-            conn.execute("ALTER TABLE users ADD COLUMN security TEXT")
+    with closing(sqlite3.connect(ACCOUNTS_DB, isolation_level=None)) as conn:
+        migrate(conn, ACCOUNT_MIGRATIONS)
     print("✅ users table ready")
 
+# --- User directory ---
+# small LRU + TTL cache of public user info (id, username, name) in front of accounts.db.
+# password / security hashes are never cached, get_user_credentials always hits the db
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 1024))
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 300))
+USER_PUBLIC_COLS = "id, username, name"
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire ttl seconds after being stored."""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._entries = collections.OrderedDict()  # key -> (expires, value)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] < time.monotonic():
+                self._evict(key)
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            while len(self._entries) > self.size:
+                self._evict(next(iter(self._entries)))
+
+    def invalidate(self, key):
+        with self._lock:
+            self._evict(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self, key):
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+
+class UserCache(TTLCache):
+    """Users by id, plus a username -> id index kept in step with evictions."""
+
+    def __init__(self, size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        super().__init__(size, ttl)
+        self._ids = {}
+
+    def get_by_username(self, username):
+        with self._lock:
+            user_id = self._ids.get(username)
+            return self.get(user_id) if user_id is not None else None
+
+    def put(self, user):
+        with self._lock:
+            super().put(user["id"], user)
+            self._ids[user["username"]] = user["id"]
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._ids.clear()
+
+    def _evict(self, user_id):
+        user = super()._evict(user_id)
+        if user and self._ids.get(user["username"]) == user_id:
+            del self._ids[user["username"]]
+        return user
+
+
+user_cache = UserCache()
+
 def get_user_by_username(username):
-    rows = query_db(ACCOUNTS_DB, "SELECT * FROM users WHERE username=?", (username,))
-    return rows[0] if rows else None
+    """Public info (id, username, name) for a username, or None."""
+    user = user_cache.get_by_username(username)
+    if user is None:
+        row = query_db(ACCOUNTS_DB, f"SELECT {USER_PUBLIC_COLS} FROM users WHERE username=?", (username,), one=True)
+        if row is None:
+            return None
+        user = dict(row)
+        user_cache.put(user)
+    return user
+
+def get_user_credentials(username):
+    """Row including password_hash / security, for login and password reset only."""
+    return query_db(ACCOUNTS_DB, "SELECT id, username, password_hash, security FROM users WHERE username=?",
+                    (username,), one=True)
+
+def get_users_by_id(user_ids):
+    """{id: public info} for many ids with at most one query (for the cache misses)."""
+    found, missing = {}, []
+    for user_id in set(user_ids):
+        user = user_cache.get(user_id)
+        if user is None:
+            missing.append(user_id)
+        else:
+            found[user_id] = user
+    if missing:
+        marks = ",".join("?" * len(missing))
+        for row in query_db(ACCOUNTS_DB, f"SELECT {USER_PUBLIC_COLS} FROM users WHERE id IN ({marks})", tuple(missing)):
+            user = dict(row)
+            user_cache.put(user)
+            found[user["id"]] = user
+    return found
+
+# --- Password hashing ---
+# password hashes are deliberately slow, so they run in a small process pool instead of on
+# the request thread. HASH_WORKERS caps how many run at once, HASH_MAX_PENDING caps how
+# many may be running or queued; past that requests get a 429 instead of piling up.
+# HASH_WORKERS=0 hashes inline (no pool)
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", min(4, os.cpu_count() or 1)))
+HASH_MAX_PENDING = int(os.environ.get("HASH_MAX_PENDING", 16))
+HASH_TIMEOUT = float(os.environ.get("HASH_TIMEOUT", 10))
+# werkzeug method string, e.g. "scrypt" or "pbkdf2:sha256:1000000". stored hashes made with
+# other parameters get upgraded on the next successful login
+PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt")
+
+
+class HashServiceError(Exception):
+    status = 503
+    message = "Server busy, please try again."
+
+class HashServiceBusy(HashServiceError):
+    status = 429
+
+
+class HashService:
+    def __init__(self, workers=HASH_WORKERS, max_pending=HASH_MAX_PENDING, method=PASSWORD_HASH_METHOD):
+        self.workers = workers
+        self.method = method
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._prefix = None
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn instead of fork: forking a threaded server is asking for trouble
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _call(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashServiceBusy()
+        try:
+            future = self._pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise HashServiceError()
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=HASH_TIMEOUT)
+        except (FutureTimeout, BrokenExecutor):
+            raise HashServiceError()
+
+    def hash(self, password):
+        return self._call(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._call(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        # the part before the first "$" is the method plus its cost parameters
+        if self._prefix is None:
+            self._prefix = generate_password_hash("", self.method).split("$", 1)[0]
+        return pwhash.split("$", 1)[0] != self._prefix
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+
+hasher = HashService()
+
+@app.errorhandler(WriteTimeout)
+def write_timeout(e):
+    return jsonify({"ok": False, "error": "Server busy, please try again."}), 503, {"Retry-After": "1"}
+
+@app.errorhandler(HashServiceError)
+def hash_service_error(e):
+    wants_json = "application/json" in (request.headers.get("Accept") or "")
+    body = jsonify({"ok": False, "error": e.message}) if wants_json else e.message
+    return body, e.status, {"Retry-After": "1"}
+
+# --- Task paging ---
+# GET /tasks pages with a keyset cursor instead of returning everything.
+# sort keys are SQL expressions and must match the expression indexes from migration v3
+# exactly, otherwise sqlite falls back to sorting in a temp b-tree
+TASK_SORT_KEYS = {
+    "createdAt": "IFNULL(createdAt, '')",
+    "dueDate": "IFNULL(dueDate, '')",
+    "priority": "CASE priority WHEN 'High' THEN 0 WHEN 'Mid' THEN 1 ELSE 2 END",
+}
+TASK_FIELDS = ("id", "user_id", "list_id", "title", "description", "dueDate", "dueTime",
+               "priority", "done", "createdAt", "updated_at", "due_at")
+TASKS_PAGE_SIZE = 100
+TASKS_MAX_PAGE_SIZE = 500
+
+def encode_cursor(sort, key, task_id):
+    raw = json.dumps([sort, key, task_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort, key, task_id = json.loads(raw)
+        # key gets bound as a sql parameter, so only scalars
+        if not isinstance(key, (str, int, float, type(None))):
+            raise ValueError("Invalid cursor")
+        return sort, key, int(task_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def parse_task_page_args(args):
+    """Read limit/cursor/sort/done/fields from the query string, raises ValueError on bad input."""
+    sort = args.get("sort") or "createdAt"
+    if sort not in TASK_SORT_KEYS:
+        raise ValueError(f"sort must be one of {', '.join(TASK_SORT_KEYS)}")
+
+    try:
+        limit = int(args.get("limit") or TASKS_PAGE_SIZE)
+    except ValueError:
+        raise ValueError("Invalid limit")
+    if limit < 1:
+        raise ValueError("Invalid limit")
+    limit = min(limit, TASKS_MAX_PAGE_SIZE)
+
+    done = args.get("done")
+    if done is not None and done != "":
+        if done.lower() in ("1", "true"):
+            done = 1
+        elif done.lower() in ("0", "false"):
+            done = 0
+        else:
+            raise ValueError("done must be 0 or 1")
+    else:
+        done = None
+
+    fields = TASK_FIELDS
+    if args.get("fields"):
+        fields = tuple(f.strip() for f in args["fields"].split(",") if f.strip())
+        unknown = [f for f in fields if f not in TASK_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields given")
+
+    after = None
+    if args.get("cursor"):
+        cursor_sort, key, task_id = decode_cursor(args["cursor"])
+        if cursor_sort != sort:
+            raise ValueError("cursor does not match sort")
+        after = (key, task_id)
+
+    return {"sort": sort, "limit": limit, "done": done, "fields": fields, "after": after}
+
+def fetch_task_page(where, args, page, include_archived=False):
+    """Run one page of a task query. where/args scope it (personal or list), page comes
+    from parse_task_page_args. include_archived also pages tasks_archive, rows then get an
+    "archived" flag. Returns (rows as dicts, next cursor or None)."""
+    where, args = list(where), list(args)
+    key = TASK_SORT_KEYS[page["sort"]]
+    if page["done"] is not None:
+        where.append("done=?")
+        args.append(page["done"])
+    if page["after"]:
+        # the ">=" lets sqlite seek into the index, the OR breaks ties on id
+        last_key, last_id = page["after"]
+        where.append(f"{key} >= ? AND ({key} > ? OR id > ?)")
+        args.extend([last_key, last_key, last_id])
+    cols = ", ".join(dict.fromkeys(("id",) + page["fields"]))
+    sql = f"SELECT {cols}, {key} AS sort_key FROM tasks WHERE {' AND '.join(where)} ORDER BY {key}, id LIMIT ?"
+    args = tuple(args) + (page["limit"] + 1,)
+    if include_archived:
+        # one page off each table's own index, then merge the two pages
+        archived = sql.replace(" FROM tasks ", " FROM tasks_archive ", 1)
+        sql = (f"SELECT *, 0 AS archived FROM ({sql}) UNION ALL SELECT *, 1 FROM ({archived}) "
+               f"ORDER BY sort_key, id LIMIT ?")
+        args = args + args + (page["limit"] + 1,)
+    rows = query_db(TASK_DB, sql, args)
+    next_cursor = None
+    if len(rows) > page["limit"]:
+        rows = rows[:page["limit"]]
+        next_cursor = encode_cursor(page["sort"], rows[-1]["sort_key"], rows[-1]["id"])
+    fields = page["fields"] + ("archived",) if include_archived else page["fields"]
+    return [{f: r[f] for f in fields} for r in rows], next_cursor
+
+# --- Search ---
+SEARCH_MAX_TERMS = 8
+# title matches count 10x a description match, the scope column never affects ranking
+SEARCH_RANK = "bm25(tasks_fts, 10.0, 1.0, 0.0)"
+# snippet()/highlight() mark matches with these, swapped for <mark> after escaping the text
+_MARK_OPEN, _MARK_CLOSE = "\x02", "\x03"
+_SEARCH_TERM = re.compile(r"\w+")
+
+def build_search_query(q, scope):
+    """FTS5 MATCH expression: every word of q as a prefix ("buy mil" finds "buy milk"),
+    limited to title/description, ANDed with the scope token. Returns None if q has no words."""
+    terms = _SEARCH_TERM.findall(q or "")[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    # quoted so words like AND/NOT/NEAR are just words. single letters match exactly, there is
+    # no 1 char prefix index and "a"* would drag in half the vocabulary
+    words = " ".join(f'"{t}"*' if len(t) > 1 else f'"{t}"' for t in terms)
+    return f'scope : "{scope}" AND {{title description}} : ({words})'
+
+def mark_matches(text):
+    text = html.escape(text or "", quote=False)
+    return text.replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+def search_tasks(match, page, after):
+    """One page of search results, best match first. after is (rank, id) of the last row of
+    the previous page. Returns (rows as dicts with a "match" entry, next cursor or None)."""
+    where, args = ["tasks_fts MATCH ?"], [match]
+    if page["done"] is not None:
+        where.append("t.done=?")
+        args.append(page["done"])
+    if after:
+        where.append(f"({SEARCH_RANK} > ? OR ({SEARCH_RANK} = ? AND t.id > ?))")
+        args.extend([after[0], after[0], after[1]])
+    cols = ", ".join(f"t.{f}" for f in dict.fromkeys(("id",) + page["fields"]))
+    rows = query_db(
+        TASK_DB,
+        f"SELECT {cols}, {SEARCH_RANK} AS rank, "
+        f"highlight(tasks_fts, 0, '{_MARK_OPEN}', '{_MARK_CLOSE}') AS title_match, "
+        f"snippet(tasks_fts, 1, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', 12) AS description_match "
+        f"FROM tasks_fts JOIN tasks t ON t.id = tasks_fts.rowid "
+        f"WHERE {' AND '.join(where)} ORDER BY rank, t.id LIMIT ?",
+        tuple(args) + (page["limit"] + 1,),
+    )
+    next_cursor = None
+    if len(rows) > page["limit"]:
+        rows = rows[:page["limit"]]
+        next_cursor = encode_cursor("rank", rows[-1]["rank"], rows[-1]["id"])
+    items = []
+    for r in rows:
+        item = {f: r[f] for f in page["fields"]}
+        item["match"] = {"title": mark_matches(r["title_match"]),
+                         "description": mark_matches(r["description_match"])}
+        items.append(item)
+    return items, next_cursor
+
+# --- Due dates ---
+DUE_UPCOMING_DAYS = 7
+DUE_MAX_DAYS = 366
+
+def fetch_due_page(where, args, page, start, end):
+    """One page of open tasks in scope with start <= due_at < end (either may be None),
+    soonest first. A range scan on the partial due_at indexes from migration v7.
+    Returns (rows as dicts, next cursor or None)."""
+    where, args = list(where) + [DUE_OPEN], list(args)
+    if start is not None:
+        where.append("due_at >= ?")
+        args.append(start)
+    if end is not None:
+        where.append("due_at < ?")
+        args.append(end)
+    if page["after"]:
+        last_key, last_id = page["after"]
+        where.append("due_at >= ? AND (due_at > ? OR id > ?)")
+        args.extend([last_key, last_key, last_id])
+    cols = ", ".join(dict.fromkeys(("id", "due_at") + page["fields"]))
+    rows = query_db(
+        TASK_DB,
+        f"SELECT {cols} FROM tasks WHERE {' AND '.join(where)} ORDER BY due_at, id LIMIT ?",
+        tuple(args) + (page["limit"] + 1,),
+    )
+    next_cursor = None
+    if len(rows) > page["limit"]:
+        rows = rows[:page["limit"]]
+        next_cursor = encode_cursor("due", rows[-1]["due_at"], rows[-1]["id"])
+    return [{f: r[f] for f in page["fields"]} for r in rows], next_cursor
+
+# --- Delta sync ---
+# tombstones are kept SYNC_RETENTION_DAYS (prune_tombstones, run by the compactor or
+# `flask prune-tombstones`). a client whose token is older than what was pruned gets a 410
+# and reloads instead of silently missing deletes
+SYNC_RETENTION_DAYS = float(os.environ.get("SYNC_RETENTION_DAYS", 30))
+SYNC_PRUNE_BATCH = int(os.environ.get("SYNC_PRUNE_BATCH", 1000))
+
+def current_sync_token():
+    return str(query_db(TASK_DB, "SELECT seq FROM sync_counter WHERE id = 1", one=True)["seq"])
+
+def fetch_task_changes(where, args, since):
+    """Rows in scope changed after `since` plus ids deleted from (or moved out of) it.
+    None when tombstones newer than `since` may already have been pruned."""
+    # read the token first: a change racing with the queries below then shows up again
+    # next time instead of being skipped
+    counter = query_db(TASK_DB, "SELECT seq, horizon FROM sync_counter WHERE id = 1", one=True)
+    if since < counter["horizon"]:
+        return None
+    token = str(counter["seq"])
+    cond = " AND ".join(where)
+    cols = ", ".join(TASK_FIELDS)
+    rows = query_db(TASK_DB, f"SELECT {cols} FROM tasks WHERE {cond} AND version > ? ORDER BY version",
+                    tuple(args) + (since,))
+    changed = [dict(r) for r in rows]
+    gone = query_db(TASK_DB, f"SELECT DISTINCT task_id FROM task_tombstones WHERE {cond} AND version > ?",
+                    tuple(args) + (since,))
+    still_here = {r["id"] for r in changed}
+    deleted = [r["task_id"] for r in gone if r["task_id"] not in still_here]
+    return {"changed": changed, "deleted": deleted, "token": token}
+
+def prune_tombstones_batch(conn, cutoff, limit):
+    """Drop up to limit tombstones older than cutoff and move the horizon past them. Runs in
+    the caller's transaction, returns how many went."""
+    rows = _fetch(conn, "SELECT rowid, version FROM task_tombstones WHERE deleted_at < ? "
+                        "ORDER BY deleted_at LIMIT ?", (cutoff, limit))
+    if not rows:
+        return 0
+    conn.execute("UPDATE sync_counter SET horizon = MAX(horizon, ?) WHERE id = 1",
+                 (max(r["version"] for r in rows),))
+    conn.execute(f"DELETE FROM task_tombstones WHERE rowid IN ({','.join('?' * len(rows))})",
+                 [r["rowid"] for r in rows])
+    return len(rows)
+
+def prune_tombstones(days=SYNC_RETENTION_DAYS, batch=SYNC_PRUNE_BATCH):
+    """Drop tombstones older than `days`, batch rows per write transaction. Returns the count."""
+    cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat(timespec="milliseconds")
+    pruned = 0
+    while True:
+        dropped = write_transaction(TASK_DB, lambda conn: prune_tombstones_batch(conn, cutoff, batch))
+        pruned += dropped
+        if dropped < batch:
+            return pruned
+
+@app.cli.command("prune-tombstones")
+@click.option("--days", type=float, default=SYNC_RETENTION_DAYS, show_default=True,
+              help="keep tombstones this many days")
+def prune_tombstones_command(days):
+    """Drop old delta sync tombstones; older sync tokens get a 410 (reload) afterwards."""
+    click.echo(f"{prune_tombstones(days)} tombstones pruned")
+
+def conditional_json(payload):
+    """jsonify with a strong ETag; answers 304 when If-None-Match matches."""
+    resp = jsonify(payload)
+    resp.add_etag()
+    return resp.make_conditional(request)
+
+# --- List events (SSE) ---
+# in-process pub/sub: task and member routes publish, GET /lists/<id>/events streams.
+# every subscriber gets a bounded queue, a client that falls behind is dropped and told
+# to resync (delta sync via ?since=) instead of letting its backlog grow. replay history is
+# kept for the SSE_HISTORY_LISTS most recently published channels only, a reconnect to one
+# whose history was dropped resyncs too
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", 15))
+SSE_BUFFER_SIZE = int(os.environ.get("SSE_BUFFER_SIZE", 100))
+SSE_HISTORY_SIZE = int(os.environ.get("SSE_HISTORY_SIZE", 256))
+SSE_HISTORY_LISTS = int(os.environ.get("SSE_HISTORY_LISTS", 1024))
+SSE_RETRY_MS = 3000
+
+
+class Subscriber:
+    def __init__(self, list_id, user_id):
+        self.list_id = list_id
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=SSE_BUFFER_SIZE)
+        self.closed = None  # reason once dropped: "resync" or "revoked"
+
+
+class EventHub:
+    def __init__(self):
+        # event ids are "<boot>:<n>" so a Last-Event-ID from before a restart is detected
+        self.boot = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._subs = {}  # list_id -> set of Subscriber
+        # list_id -> [deque of (n, event, data) for Last-Event-ID replay, newest n that fell
+        # out of it], least recently published first
+        self._history = collections.OrderedDict()
+        self._forgotten = 0  # newest n of the histories dropped to stay under SSE_HISTORY_LISTS
+
+    def publish(self, list_id, event, data):
+        with self._lock:
+            self._last_id += 1
+            item = (self._last_id, event, json.dumps(data, separators=(",", ":")))
+            entry = self._history.get(list_id)
+            if entry is None:
+                # this list's history may have been dropped before: replays from before
+                # _forgotten can't be trusted
+                entry = self._history[list_id] = [collections.deque(maxlen=SSE_HISTORY_SIZE), self._forgotten]
+                if len(self._history) > SSE_HISTORY_LISTS:
+                    _, (dropped, _) = self._history.popitem(last=False)
+                    self._forgotten = max(self._forgotten, dropped[-1][0])
+            else:
+                self._history.move_to_end(list_id)
+            history = entry[0]
+            if len(history) == history.maxlen:
+                entry[1] = history[0][0]
+            history.append(item)
+            for sub in list(self._subs.get(list_id, ())):
+                try:
+                    sub.queue.put_nowait(item)
+                except queue.Full:
+                    self._drop(sub, "resync")
+
+    def subscribe(self, list_id, user_id, last_event_id=None):
+        """Register a subscriber. Returns (subscriber, needs_resync)."""
+        sub = Subscriber(list_id, user_id)
+        resync = False
+        with self._lock:
+            if last_event_id:
+                boot, _, n = last_event_id.partition(":")
+                try:
+                    n = int(n)
+                except ValueError:
+                    n = None
+                history, evicted = self._history.get(list_id) or ((), self._forgotten)
+                if boot != self.boot or n is None or n < evicted:
+                    resync = True
+                else:
+                    backlog = [item for item in history if item[0] > n]
+                    if len(backlog) > SSE_BUFFER_SIZE:
+                        resync = True
+                    else:
+                        for item in backlog:
+                            sub.queue.put_nowait(item)
+            self._subs.setdefault(list_id, set()).add(sub)
+        return sub, resync
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subs.get(sub.list_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.list_id]
+
+    def revoke(self, list_id, user_id):
+        """Close the streams of a user who lost access to the list."""
+        with self._lock:
+            for sub in list(self._subs.get(list_id, ())):
+                if sub.user_id == user_id:
+                    self._drop(sub, "revoked")
+
+    def _drop(self, sub, reason):
+        sub.closed = reason
+        self._subs.get(sub.list_id, set()).discard(sub)
+        try:
+            sub.queue.put_nowait(None)  # wake the stream up
+        except queue.Full:
+            pass  # it will notice on its next get()
+
+    def stream(self, sub, resync):
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            if resync:
+                yield "event: resync\ndata: {}\n\n"
+            while True:
+                try:
+                    item = sub.queue.get(timeout=SSE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    item = None
+                    if not sub.closed:
+                        yield ": ping\n\n"
+                if sub.closed:
+                    yield f"event: {sub.closed}\ndata: {{}}\n\n"
+                    return
+                if item is not None:
+                    n, event, data = item
+                    yield f"id: {self.boot}:{n}\nevent: {event}\ndata: {data}\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+
+events = EventHub()
+
+def publish_task(list_id, task_id):
+    """Send the current row of a collab task to everyone watching its list."""
+    if not list_id:
+        return
+    row = query_db(TASK_DB, f"SELECT {', '.join(TASK_FIELDS)} FROM tasks WHERE id=?", (task_id,), one=True)
+    if row:
+        events.publish(list_id, "task", dict(row))
+
+def publish_task_deleted(list_id, task_id):
+    if list_id:
+        events.publish(list_id, "task_deleted", {"id": task_id})
+
+# --- Reminders ---
+# a "reminder" event goes out when an open task's due_at passes: on the list's event stream
+# for list tasks, on GET /reminders/events for personal ones. the scheduler never scans
+# tasks. it reads the next REMINDER_BATCH rows off idx_tasks_due_at into a heap and only
+# reads more once the heap has run dry. writes from this process that set a due time inside
+# the loaded range push it onto the heap (schedule()), everything later is picked up by
+# the next read. entries are re-checked against the row before firing, so tasks that were
+# completed, deleted or moved to another time since don't fire. tasks another process adds
+# inside the loaded range are missed, /tasks/overdue still has them
+REMINDER_BATCH = int(os.environ.get("REMINDER_BATCH", 100))
+# longest sleep; with nothing loaded it's also how often the index is looked at again
+REMINDER_IDLE_SECONDS = float(os.environ.get("REMINDER_IDLE_SECONDS", 60))
+REMINDERS = os.environ.get("REMINDERS", "1") == "1"
+REMINDER_QUERY = (f"SELECT id, due_at FROM tasks WHERE {DUE_OPEN} AND due_at >= ? AND (due_at > ? OR id > ?) "
+                  f"ORDER BY due_at, id LIMIT ?")
+
+
+def reminder_channel(user_id):
+    # personal reminders share the event hub with lists, under a key no list id can have
+    return f"u{user_id}"
+
+def publish_reminder(task):
+    events.publish(task["list_id"] or reminder_channel(task["user_id"]), "reminder", task)
+
+
+class ReminderScheduler:
+    def __init__(self, batch=REMINDER_BATCH):
+        self.batch = batch
+        self._cond = threading.Condition()
+        self._heap = []  # (due_at, task_id)
+        self._queued = set()
+        self._loaded = None  # (due_at, id) of the last row read off the index
+        self._exhausted = False  # the last read came back short, nothing more to load
+        # the index is read without holding _cond so schedule() never waits on sqlite.
+        # schedule() calls that come in meanwhile are kept in _pending and replayed once
+        # the read is in, a reload() bumps _generation so a read started before it is dropped
+        self._reading = False
+        self._pending = []
+        self._generation = 0
+        self._woken = False
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="reminders", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def schedule(self, task_id, due_at):
+        """A task's due time was set (call after the write committed)."""
+        if due_at is None or due_at < time.time():
+            return
+        with self._cond:
+            if self._reading:
+                self._pending.append((due_at, task_id))
+            elif self._consider(due_at, task_id):
+                self._woken = True
+                self._cond.notify()
+
+    def _consider(self, due_at, task_id):
+        """Put a newly due task where it belongs, True if the loop should look again. Call
+        with _cond held."""
+        if self._loaded is None:
+            return False  # nothing read yet, the first read sees it
+        if (due_at, task_id) <= self._loaded:
+            self._push(due_at, task_id)
+        elif self._exhausted:
+            self._exhausted = False  # there is something to load after all
+        else:
+            return False
+        return True
+
+    def reload(self):
+        """Forget what's loaded and start over from now, e.g. after a bulk import."""
+        with self._cond:
+            self._heap, self._queued = [], set()
+            self._loaded, self._exhausted = None, False
+            self._pending = []
+            self._generation += 1
+            self._woken = True
+            self._cond.notify()
+
+    def poll(self):
+        """Fire whatever is due, reading the next batch off the index if the heap ran dry.
+        Returns how many seconds until the next entry is due."""
+        with self._cond:
+            if self._loaded is None:
+                self._loaded = (int(time.time()), 0)
+            read = not self._heap and not self._exhausted and not self._reading
+            if read:
+                self._reading = True
+                loaded, generation = self._loaded, self._generation
+        if read:
+            rows = None
+            try:
+                rows = query_db(TASK_DB, REMINDER_QUERY, (loaded[0], loaded[0], loaded[1], self.batch))
+            finally:
+                with self._cond:
+                    self._reading = False
+                    pending, self._pending = self._pending, []
+                    if rows is not None and generation == self._generation:
+                        for r in rows:
+                            self._push(r["due_at"], r["id"])
+                        if rows:
+                            self._loaded = (rows[-1]["due_at"], rows[-1]["id"])
+                        self._exhausted = len(rows) < self.batch
+                    for due_at, task_id in pending:
+                        self._consider(due_at, task_id)
+        with self._cond:
+            now = time.time()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                self._queued.discard(entry)
+                due.append(entry)
+            wait = self._heap[0][0] - now if self._heap else REMINDER_IDLE_SECONDS
+        for due_at, task_id in due:
+            row = query_db(
+                TASK_DB,
+                f"SELECT {', '.join(TASK_FIELDS)} FROM tasks WHERE id=? AND due_at=? AND IFNULL(done, 0) = 0",
+                (task_id, due_at), one=True,
+            )
+            if row:
+                publish_reminder(dict(row))
+        return 0 if due else wait
+
+    def _push(self, due_at, task_id):
+        if (due_at, task_id) not in self._queued:
+            self._queued.add((due_at, task_id))
+            heapq.heappush(self._heap, (due_at, task_id))
+
+    def _run(self):
+        while True:
+            try:
+                wait = self.poll()
+            except sqlite3.Error:
+                app.logger.exception("reminder poll failed")
+                wait = REMINDER_IDLE_SECONDS
+            with self._cond:
+                if not self._woken and not self._stopped and wait > 0:
+                    self._cond.wait(min(wait, REMINDER_IDLE_SECONDS))
+                if self._stopped:
+                    return
+                self._woken = False
+                if not self._heap:
+                    self._exhausted = False  # look at the index again, another process may have added some
+
+
+reminders = ReminderScheduler()
+
+# --- Archive ---
+# every ARCHIVE_INTERVAL_SECONDS a background pass moves tasks done for more than
+# ARCHIVE_AFTER_DAYS from tasks to tasks_archive, ARCHIVE_BATCH rows per transaction (through
+# the write queue when that's on) so request writes get the lock in between. archive_state.moving
+# is set around the move, so the list counters keep counting them and delta sync doesn't report
+# them as deleted; search only covers active tasks. an edit or delete of an archived task moves
+# it back first (restore_archived). tombstones older than SYNC_RETENTION_DAYS are pruned in
+# the same pass. afterwards up to ARCHIVE_VACUUM_PAGES free pages go
+# back to the filesystem and ANALYZE (sampled, analysis_limit) refreshes the planner stats
+ARCHIVE = os.environ.get("ARCHIVE", "1") == "1"
+ARCHIVE_AFTER_DAYS = float(os.environ.get("ARCHIVE_AFTER_DAYS", 30))
+ARCHIVE_BATCH = int(os.environ.get("ARCHIVE_BATCH", 500))
+ARCHIVE_INTERVAL_SECONDS = float(os.environ.get("ARCHIVE_INTERVAL_SECONDS", 3600))
+ARCHIVE_VACUUM_PAGES = int(os.environ.get("ARCHIVE_VACUUM_PAGES", 2000))
+ARCHIVE_ANALYSIS_LIMIT = int(os.environ.get("ARCHIVE_ANALYSIS_LIMIT", 1000))
+ARCHIVE_COLS = ", ".join(TASK_FIELDS)
+
+def archive_batch(conn, cutoff, limit):
+    """Move up to limit tasks done and last changed before cutoff to tasks_archive. Runs in
+    the caller's transaction, returns how many moved."""
+    ids = [r["id"] for r in _fetch(
+        conn, "SELECT id FROM tasks WHERE IFNULL(done, 0) != 0 AND updated_at < ? ORDER BY updated_at LIMIT ?",
+        (cutoff, limit))]
+    if not ids:
+        return 0
+    marks = ",".join("?" * len(ids))
+    conn.execute(f"INSERT INTO tasks_archive ({ARCHIVE_COLS}, archived_at) "
+                 f"SELECT {ARCHIVE_COLS}, ? FROM tasks WHERE id IN ({marks})",
+                 (datetime.datetime.now().isoformat(),) + tuple(ids))
+    conn.execute("UPDATE archive_state SET moving = 1 WHERE id = 1")
+    conn.execute(f"DELETE FROM tasks WHERE id IN ({marks})", ids)
+    conn.execute("UPDATE archive_state SET moving = 0 WHERE id = 1")
+    return len(ids)
+
+def restore_archived(conn, user_id, task_ids):
+    """Move the archived tasks among task_ids that user_id may touch back into tasks, ahead of
+    an edit or delete. Runs in the caller's transaction, returns the ids moved."""
+    marks = ",".join("?" * len(task_ids))
+    ids = [r["id"] for r in _fetch(
+        conn, f"SELECT id FROM tasks_archive WHERE id IN ({marks}) AND {ARCHIVE_ACCESS}",
+        (*task_ids, user_id, user_id))]
+    if not ids:
+        return []
+    marks = ",".join("?" * len(ids))
+    conn.execute("UPDATE archive_state SET moving = 1 WHERE id = 1")
+    conn.execute(f"INSERT INTO tasks ({ARCHIVE_COLS}) SELECT {ARCHIVE_COLS} FROM tasks_archive WHERE id IN ({marks})",
+                 ids)
+    conn.execute("UPDATE archive_state SET moving = 0 WHERE id = 1")
+    conn.execute(f"DELETE FROM tasks_archive WHERE id IN ({marks})", ids)
+    return ids
+
+def compact_tasks(after_days=ARCHIVE_AFTER_DAYS, batch=ARCHIVE_BATCH, vacuum_pages=ARCHIVE_VACUUM_PAGES,
+                  sync_retention_days=SYNC_RETENTION_DAYS):
+    """One archive + tombstone prune + incremental vacuum + ANALYZE pass. Returns
+    {archived, pruned_tombstones, vacuumed_pages}."""
+    cutoff = (datetime.datetime.now() - datetime.timedelta(days=after_days)).isoformat(timespec="milliseconds")
+    archived = 0
+    while True:
+        moved = write_transaction(TASK_DB, lambda conn: archive_batch(conn, cutoff, batch))
+        archived += moved
+        if moved < batch:
+            break
+    # every archived row left a tombstone behind (tasks_sync_delete), drop the old ones so
+    # task_tombstones stays as small as tasks
+    pruned = prune_tombstones(sync_retention_days)
+    pool = get_pool(TASK_DB)
+    conn = pool.acquire()
+    try:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # runs one page per step, fetchall() steps it to the end
+        conn.execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})").fetchall()
+        vacuumed = free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.execute(f"PRAGMA analysis_limit={ARCHIVE_ANALYSIS_LIMIT}")
+        conn.execute("ANALYZE")
+    finally:
+        pool.release(conn)
+    return {"archived": archived, "pruned_tombstones": pruned, "vacuumed_pages": vacuumed}
+
+
+class Compactor:
+    def __init__(self, interval=ARCHIVE_INTERVAL_SECONDS):
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="compactor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopped.set()
+            thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                result = compact_tasks()
+            except sqlite3.Error:
+                app.logger.exception("task compaction failed")
+            else:
+                app.logger.info("archived %(archived)d tasks, pruned %(pruned_tombstones)d tombstones, "
+                                "vacuumed %(vacuumed_pages)d pages", result)
+
+
+compactor = Compactor()
+
+@app.cli.command("compact-tasks")
+@click.option("--days", type=float, default=ARCHIVE_AFTER_DAYS, show_default=True,
+              help="archive tasks done for longer than this")
+def compact_tasks_command(days):
+    """Archive old completed tasks and prune old tombstones now, then incremental vacuum + ANALYZE."""
+    result = compact_tasks(after_days=days)
+    click.echo(f"{result['archived']} tasks archived, {result['pruned_tombstones']} tombstones pruned, "
+               f"{result['vacuumed_pages']} pages vacuumed")
+
+# --- Permissions ---
+# (user_id, list_id) -> bool. short ttl since another process may change memberships
+MEMBERSHIP_CACHE_SIZE = int(os.environ.get("MEMBERSHIP_CACHE_SIZE", 4096))
+MEMBERSHIP_CACHE_TTL = float(os.environ.get("MEMBERSHIP_CACHE_TTL", 30))
+membership_cache = TTLCache(MEMBERSHIP_CACHE_SIZE, MEMBERSHIP_CACHE_TTL)
+
+# "can user ? touch this task" as a WHERE clause, so writes check access in the same
+# statement. binds user_id twice
+TASK_ACCESS = ("((list_id IS NULL AND user_id=?) OR EXISTS "
+               "(SELECT 1 FROM list_members m WHERE m.list_id=tasks.list_id AND m.user_id=?))")
+ARCHIVE_ACCESS = TASK_ACCESS.replace("tasks.list_id", "tasks_archive.list_id")
 
 def is_member(user_id, list_id):
     if list_id is None:
         return True
-    rows = query_db(TASK_DB, "SELECT 1 FROM list_members WHERE list_id=? AND user_id=?", (list_id, user_id))
-    return bool(rows)
+    member = membership_cache.get((user_id, list_id))
+    if member is None:
+        rows = query_db(TASK_DB, "SELECT 1 FROM list_members WHERE list_id=? AND user_id=?", (list_id, user_id))
+        member = bool(rows)
+        membership_cache.put((user_id, list_id), member)
+    return member
+
+def task_access_error(task_id):
+    """Response for a write that matched no row: the task is missing or not ours."""
+    if query_db(TASK_DB, "SELECT 1 FROM tasks WHERE id=? UNION ALL SELECT 1 FROM tasks_archive WHERE id=?",
+                (task_id, task_id), one=True):
+        return ("Forbidden", 403)
+    return ("Not found", 404)
 
 
 # --- Routes ---
 #returns if not at logged in
+# first page script.js asks for on load, must match its defaults (sortBy, PAGE_SIZE, "Show
+# Completed" unchecked). script.js checks before using it and fetches itself on a mismatch
+HOME_TASKS_PAGE = {"sort": "createdAt", "limit": "50", "done": "0"}
+
 @app.route("/")
 def home():
     if "user_id" not in session:
         return redirect(url_for("auth"))
-    return render_template("index.html", username=session["username"])
+    user_id = session["user_id"]
+    page = parse_task_page_args(HOME_TASKS_PAGE)
+    # everything the page would otherwise fetch with GET /lists + GET /tasks, from one snapshot
+    with db_snapshot(TASK_DB):
+        lists = fetch_user_lists(user_id, include_personal=True)
+        token = current_sync_token()
+        items, next_cursor = fetch_task_page(["user_id=?", "list_id IS NULL"], [user_id], page)
+    initial_state = {
+        "lists": [dict(r) for r in lists],
+        "tasks": {**HOME_TASKS_PAGE, "items": items, "next": next_cursor, "token": token},
+    }
+    return render_template("index.html", username=session["username"], initial_state=initial_state)
 
 @app.route("/auth", methods=["GET", "POST"])
 def auth():
@@ -141,8 +1966,8 @@ def auth():
             flash("Username already exists.")
             return redirect(url_for("auth"))
 
-        hashed_pw = generate_password_hash(password)
-        hashed_sec = generate_password_hash(security)
+        hashed_pw = hasher.hash(password)
+        hashed_sec = hasher.hash(security)
         query_db(
             ACCOUNTS_DB,
             "INSERT INTO users (username, name, security, password_hash) VALUES (?, ?, ?, ?)",
@@ -160,12 +1985,19 @@ def auth():
                 return jsonify({"ok": False, "error": "Already logged in."}), 400
             flash("Already logged in.")
             return redirect(url_for("home"))
-        user = get_user_by_username(username)
-        if not user or not check_password_hash(user["password_hash"], password):
+        user = get_user_credentials(username)
+        if not user or not hasher.verify(user["password_hash"], password):
             if wants_json:
                 return jsonify({"ok": False, "error": "Invalid username or password."}), 401
             flash("Invalid username or password.")
             return redirect(url_for("auth"))
+        # upgrade hashes made with old cost parameters while we have the plaintext
+        if hasher.needs_rehash(user["password_hash"]):
+            try:
+                query_db(ACCOUNTS_DB, "UPDATE users SET password_hash=? WHERE id=?",
+                         (hasher.hash(password), user["id"]))
+            except HashServiceError:
+                pass  # try again next login
 
 #permanent
         session.permanent = True
@@ -204,15 +2036,16 @@ def profile():
     new_pw = request.form.get("new_password")
 
     if new_pw:
-        if not check_password_hash(user["password_hash"], old_pw):
+        if not hasher.verify(user["password_hash"], old_pw):
             flash("Old password incorrect.")
             return redirect(url_for("profile"))
-        new_hash = generate_password_hash(new_pw)
+        new_hash = hasher.hash(new_pw)
     else:
         new_hash = user["password_hash"]
 
     query_db(ACCOUNTS_DB, "UPDATE users SET name=?, username=?, password_hash=? WHERE id=?",
              (name, username, new_hash, user_id))
+    user_cache.invalidate(user_id)
     session["username"] = username
     flash("Profile updated successfully.")
     return redirect(url_for("profile"))
@@ -234,7 +2067,7 @@ def forgot_password():
         flash("Please fill all fields (username, security, new password).")
         return redirect(url_for("auth"))
 
-    user = get_user_by_username(username)
+    user = get_user_credentials(username)
     if not user:
         if wants_json:
             return jsonify({"ok": False, "error": "User not found."}), 404
@@ -242,14 +2075,14 @@ def forgot_password():
         return redirect(url_for("auth"))
 
     # Verify security answer against stored hash
-    if not check_password_hash(user["security"], security_answer):
+    if not hasher.verify(user["security"], security_answer):
         if wants_json:
             return jsonify({"ok": False, "error": "Incorrect security answer."}), 403
         flash("Incorrect security answer.")
         return redirect(url_for("auth"))
 
     # Update password
-    new_hash = generate_password_hash(new_password)
+    new_hash = hasher.hash(new_password)
     query_db(ACCOUNTS_DB, "UPDATE users SET password_hash=? WHERE id=?", (new_hash, user["id"]))
 
     if wants_json:
@@ -265,6 +2098,16 @@ def get_tasks():
         return jsonify([])
     user_id = session["user_id"]
     list_id = request.args.get("list_id")
+    since = request.args.get("since")
+    try:
+        page = parse_task_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return jsonify({"ok": False, "error": "Invalid since"}), 400
     #gets list and ensures that they are a member of an owner
     if list_id:
         # Ensure user is a member of the collab list
@@ -274,11 +2117,108 @@ def get_tasks():
             return jsonify({"ok": False, "error": "Invalid list_id"}), 400
         if not is_member(user_id, lid):
             return ("Forbidden", 403)
-        rows = query_db(TASK_DB, "SELECT * FROM tasks WHERE list_id=?", (lid,))
+        where, args = ["list_id=?"], [lid]
     else:
         # GET fetches tasks owned by current user only:
-        rows = query_db(TASK_DB, "SELECT * FROM tasks WHERE user_id=? AND (list_id IS NULL OR list_id='')", (user_id,))
-    return jsonify([dict(r) for r in rows])
+        where, args = ["user_id=?", "list_id IS NULL"], [user_id]
+    if since is not None:
+        changes = fetch_task_changes(where, args, since)
+        if changes is None:
+            return jsonify({"ok": False, "error": "Sync token expired, reload", "resync": True}), 410
+        return conditional_json(changes)
+    token = current_sync_token()
+    items, next_cursor = fetch_task_page(where, args, page, request.args.get("include_archived") == "1")
+    resp = conditional_json(items)
+    resp.headers["X-Sync-Token"] = token
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = next_cursor
+    return resp
+
+@app.route("/tasks/search", methods=["GET"])
+def search_tasks_endpoint():
+    if "user_id" not in session:
+        return jsonify([])
+    user_id = session["user_id"]
+    list_id = request.args.get("list_id")
+    try:
+        # same limit/done/fields handling as GET /tasks, the cursor is ours (rank based)
+        page = parse_task_page_args({k: v for k, v in request.args.items() if k not in ("sort", "cursor")})
+        after = None
+        if request.args.get("cursor"):
+            cursor_sort, rank, task_id = decode_cursor(request.args["cursor"])
+            if cursor_sort != "rank":
+                raise ValueError("Invalid cursor")
+            after = (float(rank), int(task_id))
+    except (ValueError, TypeError) as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    # same visibility as GET /tasks: one collab list you're a member of, or your personal tasks
+    if list_id:
+        try:
+            lid = int(list_id)
+        except ValueError:
+            return jsonify({"ok": False, "error": "Invalid list_id"}), 400
+        if not is_member(user_id, lid):
+            return ("Forbidden", 403)
+        scope = f"l{lid}"
+    else:
+        scope = f"u{user_id}"
+    match = build_search_query(request.args.get("q"), scope)
+    if match is None:
+        return jsonify({"ok": False, "error": "q required"}), 400
+    items, next_cursor = search_tasks(match, page, after)
+    resp = jsonify(items)
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = next_cursor
+    return resp
+
+def due_tasks_response(start, end):
+    """Shared body of /tasks/upcoming and /tasks/overdue: scope, paging and the due range."""
+    user_id = session["user_id"]
+    list_id = request.args.get("list_id")
+    try:
+        # limit/fields like GET /tasks, always open tasks in due_at order
+        page = parse_task_page_args({k: v for k, v in request.args.items() if k in ("limit", "fields")})
+        if request.args.get("cursor"):
+            cursor_sort, due_at, task_id = decode_cursor(request.args["cursor"])
+            if cursor_sort != "due":
+                raise ValueError("Invalid cursor")
+            page["after"] = (int(due_at), task_id)
+    except (ValueError, TypeError) as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    if list_id:
+        try:
+            lid = int(list_id)
+        except ValueError:
+            return jsonify({"ok": False, "error": "Invalid list_id"}), 400
+        if not is_member(user_id, lid):
+            return ("Forbidden", 403)
+        where, args = ["list_id=?"], [lid]
+    else:
+        where, args = ["user_id=?", "list_id IS NULL"], [user_id]
+    items, next_cursor = fetch_due_page(where, args, page, start, end)
+    resp = jsonify(items)
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = next_cursor
+    return resp
+
+@app.route("/tasks/upcoming", methods=["GET"])
+def upcoming_tasks():
+    if "user_id" not in session:
+        return jsonify([])
+    try:
+        days = float(request.args.get("days") or DUE_UPCOMING_DAYS)
+    except ValueError:
+        return jsonify({"ok": False, "error": "Invalid days"}), 400
+    if not 0 < days <= DUE_MAX_DAYS:
+        return jsonify({"ok": False, "error": f"days must be between 0 and {DUE_MAX_DAYS}"}), 400
+    now = int(time.time())
+    return due_tasks_response(now, now + int(days * 86400))
+
+@app.route("/tasks/overdue", methods=["GET"])
+def overdue_tasks():
+    if "user_id" not in session:
+        return jsonify([])
+    return due_tasks_response(None, int(time.time()))
 
 @app.route("/tasks", methods=["POST"])
 def add_task():
@@ -295,9 +2235,11 @@ def add_task():
             return jsonify({"ok": False, "error": "Invalid list_id"}), 400
         if not is_member(user_id, lid):
             return ("Forbidden", 403)
-    query_db(
+    row = write_db(
         TASK_DB,
-        "INSERT INTO tasks (user_id, list_id, title, description, dueDate, dueTime, priority, createdAt) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        "INSERT INTO tasks (user_id, list_id, title, description, dueDate, dueTime, priority, createdAt) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+        # RETURNING sees the row before the due_at trigger ran, so work it out here too
+        f"RETURNING id, {_due_at('')} AS due_at",
         (
             user_id,
             lid,
@@ -307,9 +2249,12 @@ def add_task():
             data.get("dueTime"),
             data.get("priority", "Low"),
             datetime.datetime.now().isoformat()
-        )
+        ),
+        one=True,
     )
-    return jsonify({"message": "Task added"}), 201
+    publish_task(lid, row["id"])
+    reminders.schedule(row["id"], row["due_at"])
+    return jsonify({"message": "Task added", "id": row["id"]}), 201
 
 @app.route("/tasks/<int:task_id>", methods=["PATCH", "PUT"])
 def update_task(task_id):
@@ -318,18 +2263,6 @@ def update_task(task_id):
         return ("Unauthorized", 401)
     user_id = session["user_id"]
     data = request.json or {}
-    # Fetch task to check permissions
-    row = query_db(TASK_DB, "SELECT * FROM tasks WHERE id=?", (task_id,), one=True)
-    if not row:
-        return ("Not found", 404)
-    owner_id = row["user_id"]
-    list_id = row["list_id"]
-    if list_id:
-        if not is_member(user_id, list_id):
-            return ("Forbidden", 403)
-    else:
-        if owner_id != user_id:
-            return ("Forbidden", 403)
     fields = []
     args = []
     for key in ["title", "description", "dueDate", "dueTime", "priority", "done"]:
@@ -338,8 +2271,21 @@ def update_task(task_id):
             args.append(data[key])
     if not fields:
         return jsonify({"ok": False, "error": "No fields to update"}), 400
-    args.append(task_id)
-    query_db(TASK_DB, f"UPDATE tasks SET {', '.join(fields)} WHERE id=?", tuple(args))
+    # permission check is part of the UPDATE, no row back means missing, forbidden or archived
+    # (then moved back and updated)
+    def update(conn):
+        query = (f"UPDATE tasks SET {', '.join(fields)} WHERE id=? AND {TASK_ACCESS} "
+                 f"RETURNING list_id, {_due_at('')} AS due_at")
+        params = tuple(args) + (task_id, user_id, user_id)
+        rows = _fetch(conn, query, params)
+        if not rows and restore_archived(conn, user_id, [task_id]):
+            rows = _fetch(conn, query, params)
+        return rows[0] if rows else None
+    row = write_transaction(TASK_DB, update)
+    if not row:
+        return task_access_error(task_id)
+    publish_task(row["list_id"], task_id)
+    reminders.schedule(task_id, row["due_at"])
     return jsonify({"message": "Task updated"}), 200
 
 @app.route("/tasks/<int:task_id>", methods=["DELETE"])
@@ -347,40 +2293,466 @@ def delete_task(task_id):
     if "user_id" not in session:
         return ("Unauthorized", 401)
     user_id = session["user_id"]
-    row = query_db(TASK_DB, "SELECT * FROM tasks WHERE id=?", (task_id,), one=True)
+    def delete(conn):
+        query = f"DELETE FROM tasks WHERE id=? AND {TASK_ACCESS} RETURNING list_id"
+        rows = _fetch(conn, query, (task_id, user_id, user_id))
+        if not rows and restore_archived(conn, user_id, [task_id]):
+            rows = _fetch(conn, query, (task_id, user_id, user_id))
+        return rows[0] if rows else None
+    row = write_transaction(TASK_DB, delete)
     if not row:
-        return ("Not found", 404)
-    owner_id = row["user_id"]
-    list_id = row["list_id"]
-    if list_id:
-        if not is_member(user_id, list_id):
-            return ("Forbidden", 403)
-    else:
-        if owner_id != user_id:
-            return ("Forbidden", 403)
-    query_db(TASK_DB, "DELETE FROM tasks WHERE id=?", (task_id,))
+        return task_access_error(task_id)
+    publish_task_deleted(row["list_id"], task_id)
     return jsonify({"message": "Task deleted"}), 200
 
+# --- Batch ---
+TASK_BATCH_MAX_OPS = 500
+TASK_EDITABLE_FIELDS = ("title", "description", "dueDate", "dueTime", "priority", "done")
+
+class BatchError(Exception):
+    def __init__(self, status, index, error):
+        super().__init__(error)
+        self.status, self.index, self.error = status, index, error
+
+def _parse_list_id(value, index):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        raise BatchError(400, index, "Invalid list_id")
+
+def parse_batch_ops(ops):
+    """Validate the ops of a batch request. Returns (creates, updates, deletes) where updates
+    is {task_id: {field: value}} with later ops for the same task winning."""
+    if not isinstance(ops, list) or not ops:
+        raise BatchError(400, None, "ops must be a non-empty list")
+    if len(ops) > TASK_BATCH_MAX_OPS:
+        raise BatchError(400, None, f"At most {TASK_BATCH_MAX_OPS} ops per batch")
+    creates, updates, deletes = [], {}, []
+    for i, op in enumerate(ops):
+        if not isinstance(op, dict):
+            raise BatchError(400, i, "op must be an object")
+        kind = op.get("op")
+        # values get bound as sql parameters, so only scalars
+        for k in TASK_EDITABLE_FIELDS:
+            if not isinstance(op.get(k), (str, int, float, type(None))):
+                raise BatchError(400, i, f"Invalid {k}")
+        if kind == "create":
+            if not op.get("title"):
+                raise BatchError(400, i, "title required")
+            creates.append((i, op, _parse_list_id(op.get("list_id"), i)))
+            continue
+        if kind not in ("update", "delete"):
+            raise BatchError(400, i, "op must be create, update or delete")
+        try:
+            task_id = int(op.get("id"))
+        except (ValueError, TypeError):
+            raise BatchError(400, i, "Invalid id")
+        if kind == "delete":
+            deletes.append((i, task_id))
+            continue
+        fields = {k: op[k] for k in TASK_EDITABLE_FIELDS if k in op}
+        if "list_id" in op:
+            fields["list_id"] = _parse_list_id(op["list_id"], i)
+        if not fields:
+            raise BatchError(400, i, "No fields to update")
+        index, merged = updates.get(task_id, (i, {}))
+        merged.update(fields)
+        updates[task_id] = (index, merged)
+    return creates, updates, deletes
+
+def apply_task_batch(conn, user_id, creates, updates, deletes):
+    """Check permissions and apply a parsed batch on conn (inside one transaction).
+    Raises BatchError without writing anything if any op is not allowed.
+    Returns (created ids, deleted ids, resulting rows, {task_id: row before} for updated/deleted)."""
+    task_ids = set(updates) | {task_id for _, task_id in deletes}
+    if task_ids:
+        restore_archived(conn, user_id, list(task_ids))  # no-op for ids that aren't archived
+    existing = {}
+    if task_ids:
+        marks = ",".join("?" * len(task_ids))
+        for r in conn.execute(f"SELECT id, user_id, list_id FROM tasks WHERE id IN ({marks})", tuple(task_ids)):
+            existing[r["id"]] = r
+
+    # every list touched by the batch, checked with one query instead of once per op
+    list_ids = {lid for _, _, lid in creates if lid is not None}
+    list_ids |= {r["list_id"] for r in existing.values() if r["list_id"]}
+    list_ids |= {f["list_id"] for _, f in updates.values() if f.get("list_id") is not None}
+    allowed = set()
+    if list_ids:
+        marks = ",".join("?" * len(list_ids))
+        allowed = {r[0] for r in conn.execute(
+            f"SELECT list_id FROM list_members WHERE user_id=? AND list_id IN ({marks})",
+            (user_id, *list_ids))}
+
+    def check(index, task_id):
+        row = existing.get(task_id)
+        if not row:
+            raise BatchError(404, index, "Not found")
+        if row["list_id"] and row["list_id"] not in allowed:
+            raise BatchError(403, index, "Forbidden")
+        if not row["list_id"] and row["user_id"] != user_id:
+            raise BatchError(403, index, "Forbidden")
+
+    for index, _, lid in creates:
+        if lid is not None and lid not in allowed:
+            raise BatchError(403, index, "Forbidden")
+    for task_id, (index, fields) in updates.items():
+        check(index, task_id)
+        if fields.get("list_id") is not None and fields["list_id"] not in allowed:
+            raise BatchError(403, index, "Forbidden")
+    for index, task_id in deletes:
+        check(index, task_id)
+
+    created = []
+    if creates:
+        now = datetime.datetime.now().isoformat()
+        conn.executemany(
+            "INSERT INTO tasks (user_id, list_id, title, description, dueDate, dueTime, priority, createdAt) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(user_id, lid, op["title"], op.get("description", ""), op.get("dueDate"),
+              op.get("dueTime"), op.get("priority", "Low"), now) for _, op, lid in creates],
+        )
+        # we hold the write lock and tasks uses AUTOINCREMENT, so the new ids are consecutive
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        created = list(range(last_id - len(creates) + 1, last_id + 1))
+
+    # one executemany per distinct set of updated columns
+    groups = {}
+    for task_id, (_, fields) in updates.items():
+        if "list_id" in fields and fields["list_id"] is None:
+            # moving into Personal makes it the mover's personal task
+            fields["user_id"] = user_id
+        cols = tuple(sorted(fields))
+        groups.setdefault(cols, []).append(tuple(fields[c] for c in cols) + (task_id,))
+    for cols, rows in groups.items():
+        conn.executemany(f"UPDATE tasks SET {', '.join(c + '=?' for c in cols)} WHERE id=?", rows)
+
+    deleted = sorted({task_id for _, task_id in deletes})
+    if deleted:
+        conn.executemany("DELETE FROM tasks WHERE id=?", [(task_id,) for task_id in deleted])
+
+    changed = (set(created) | set(updates)) - set(deleted)
+    rows = []
+    if changed:
+        marks = ",".join("?" * len(changed))
+        rows = conn.execute(f"SELECT * FROM tasks WHERE id IN ({marks}) ORDER BY id", tuple(changed)).fetchall()
+    return created, deleted, rows, existing
+
+@app.route("/tasks/batch", methods=["POST"])
+def batch_tasks():
+    if "user_id" not in session:
+        return ("Unauthorized", 401)
+    user_id = session["user_id"]
+    data = request.json or {}
+    try:
+        creates, updates, deletes = parse_batch_ops(data.get("ops"))
+        with db_transaction(TASK_DB) as conn:
+            created, deleted, rows, before = apply_task_batch(conn, user_id, creates, updates, deletes)
+    except BatchError as e:
+        return jsonify({"ok": False, "error": e.error, "index": e.index}), e.status
+    # only announce once the transaction is committed
+    for task_id in deleted:
+        publish_task_deleted(before[task_id]["list_id"], task_id)
+    for r in rows:
+        reminders.schedule(r["id"], r["due_at"])
+        old = before.get(r["id"])
+        if old and old["list_id"] and old["list_id"] != r["list_id"]:
+            publish_task_deleted(old["list_id"], r["id"])
+        if r["list_id"]:
+            events.publish(r["list_id"], "task", {f: r[f] for f in TASK_FIELDS})
+    return jsonify({
+        "message": "Batch applied",
+        "created": created,
+        "deleted": deleted,
+        "tasks": [dict(r) for r in rows],
+    }), 200
+
+# === Export / Import ===
+EXPORT_FETCH_SIZE = 500
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", 500))
+IMPORT_MAX_ERRORS = 100  # per-row errors reported back, the rest are only counted
+IMPORT_FIELDS = ("title", "description", "dueDate", "dueTime", "priority", "done", "list_id", "createdAt")
+# personal tasks, then the tasks of every list the user belongs to, active then archived.
+# UNION ALL without ORDER BY so every part walks an index and rows stream straight off the cursor
+EXPORT_QUERY = " UNION ALL ".join(
+    f"SELECT {', '.join(TASK_FIELDS)} FROM {table} WHERE user_id=? AND list_id IS NULL "
+    f"UNION ALL "
+    f"SELECT {', '.join('t.' + f for f in TASK_FIELDS)} FROM list_members m "
+    f"JOIN {table} t ON t.list_id = m.list_id WHERE m.user_id=?"
+    for table in ("tasks", "tasks_archive")
+)
+
+def export_rows(user_id):
+    """Yield the user's tasks in EXPORT_FETCH_SIZE batches straight from a sqlite cursor.
+    Runs after the view has returned, so it borrows its own pool connection."""
+    pool = get_pool(TASK_DB)
+    conn = pool.acquire()
+    try:
+        cur = conn.execute(EXPORT_QUERY, (user_id,) * 4)
+        while True:
+            rows = cur.fetchmany(EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            yield rows
+        cur.close()
+    finally:
+        pool.release(conn)
+
+def export_ndjson(user_id):
+    for rows in export_rows(user_id):
+        yield "".join(json.dumps(dict(r), separators=(",", ":")) + "\n" for r in rows)
+
+def export_csv(user_id):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(TASK_FIELDS)
+    for rows in export_rows(user_id):
+        writer.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue()  # header only, when there are no tasks
+
+@app.route("/export", methods=["GET"])
+def export_tasks():
+    if "user_id" not in session:
+        return ("Unauthorized", 401)
+    fmt = request.args.get("format", "ndjson")
+    if fmt == "ndjson":
+        body, mimetype = export_ndjson(session["user_id"]), "application/x-ndjson"
+    elif fmt == "csv":
+        body, mimetype = export_csv(session["user_id"]), "text/csv"
+    else:
+        return jsonify({"ok": False, "error": "format must be ndjson or csv"}), 400
+    filename = f"tasks-{datetime.date.today().isoformat()}.{fmt}"
+    return app.response_class(body, mimetype=mimetype,
+                              headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+def import_records(stream, fmt):
+    """Yield (line number, dict or error message) for every record of an NDJSON/CSV text stream,
+    reading it line by line."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        if not reader.fieldnames or "title" not in reader.fieldnames:
+            raise ValueError("CSV needs a header row with at least a title column")
+        line_no = reader.line_num + 1
+        for record in reader:
+            yield line_no, record  # where the record starts, quoted values can span lines
+            line_no = reader.line_num + 1
+        return
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_no, "Invalid JSON"
+            continue
+        yield line_no, record if isinstance(record, dict) else "Expected a JSON object"
+
+def parse_import_record(record):
+    """Turn one imported record into (list_id, title, description, dueDate, dueTime, priority,
+    done, createdAt). CSV gives every value as a string, empty meaning missing. Raises ValueError."""
+    values = {f: record.get(f) for f in IMPORT_FIELDS}
+    for f, v in values.items():
+        # NDJSON can carry objects/arrays, which sqlite can't bind
+        if not isinstance(v, (str, int, float, type(None))):
+            raise ValueError(f"Invalid {f}")
+        if v == "":
+            values[f] = None
+    if not values["title"] or not isinstance(values["title"], str):
+        raise ValueError("title required")
+    lid = values["list_id"]
+    if lid is not None:
+        try:
+            lid = int(lid)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid list_id")
+    done = values["done"]
+    if done is None:
+        done = 0
+    elif str(done).lower() in ("1", "true"):
+        done = 1
+    elif str(done).lower() in ("0", "false"):
+        done = 0
+    else:
+        raise ValueError("done must be 0 or 1")
+    return (lid, values["title"], values["description"] or "", values["dueDate"], values["dueTime"],
+            values["priority"] or "Low", done, values["createdAt"] or datetime.datetime.now().isoformat())
+
+def import_upload():
+    """(text stream, format) for the request: a multipart "file" upload or the raw body.
+    format comes from ?format=, else the file name / content type, else NDJSON."""
+    fmt = request.args.get("format")
+    if request.mimetype == "multipart/form-data":
+        upload = request.files.get("file")
+        if upload is None:
+            raise ValueError("file required")
+        raw = upload.stream
+        if fmt is None and (upload.filename or "").lower().endswith(".csv"):
+            fmt = "csv"
+    else:
+        raw = io.BufferedReader(request.stream)
+        if fmt is None and request.mimetype == "text/csv":
+            fmt = "csv"
+    fmt = fmt or "ndjson"
+    if fmt not in ("ndjson", "csv"):
+        raise ValueError("format must be ndjson or csv")
+    return io.TextIOWrapper(raw, encoding="utf-8-sig", errors="replace", newline=""), fmt
+
+@app.route("/import", methods=["POST"])
+def import_tasks():
+    if "user_id" not in session:
+        return ("Unauthorized", 401)
+    user_id = session["user_id"]
+    imported, error_count, errors = 0, 0, []
+    failed = None
+    allowed = {}  # list_id -> member?, each list checked once per import
+    touched = set()
+
+    def reject(line_no, error):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < IMPORT_MAX_ERRORS:
+            errors.append({"line": line_no, "error": error})
+
+    def flush(chunk):
+        # membership lookups happen above, outside the write transaction
+        with db_transaction(TASK_DB) as conn:
+            conn.executemany(
+                "INSERT INTO tasks (user_id, list_id, title, description, dueDate, dueTime, priority, done, createdAt) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(user_id, *row) for row in chunk],
+            )
+
+    try:
+        stream, fmt = import_upload()
+        chunk = []
+        for line_no, record in import_records(stream, fmt):
+            if isinstance(record, str):
+                reject(line_no, record)
+                continue
+            try:
+                row = parse_import_record(record)
+            except ValueError as e:
+                reject(line_no, str(e))
+                continue
+            lid = row[0]
+            if lid is not None:
+                if lid not in allowed:
+                    allowed[lid] = is_member(user_id, lid)
+                if not allowed[lid]:
+                    reject(line_no, "Forbidden list_id")
+                    continue
+                touched.add(lid)
+            chunk.append(row)
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                flush(chunk)
+                imported += len(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+            imported += len(chunk)
+    except (ValueError, csv.Error) as e:
+        if not imported:
+            return jsonify({"ok": False, "error": str(e)}), 400
+        errors.append({"line": None, "error": str(e)})
+        error_count += 1
+    except sqlite3.Error as e:
+        # only the chunk being written rolled back, the ones flushed before it stay
+        app.logger.exception("import failed after %d rows", imported)
+        failed = f"Database error, import stopped after {imported} rows: {e}"
+    finally:
+        # members watching a list catch up with one delta sync instead of an event per task
+        for lid in touched:
+            events.publish(lid, "resync", {})
+        if imported:
+            reminders.reload()  # cheaper than scheduling row by row
+    if failed:
+        return jsonify({"ok": False, "error": failed, "imported": imported, "error_count": error_count,
+                        "errors": errors}), 500
+    return jsonify({"ok": True, "imported": imported, "error_count": error_count, "errors": errors}), 200
+
+
 # === Collaborative Lists ===
 @app.route("/lists", methods=["GET"])
 #shows all  lists current user has
 def list_lists():
     if "user_id" not in session:
         return ("Unauthorized", 401)
-    user_id = session["user_id"]
-    rows = query_db(
+    rows = fetch_user_lists(session["user_id"], include_personal=request.args.get("include_personal") == "1")
+    return conditional_json([dict(r) for r in rows])
+
+# counters for one scope, read from list_stats (joined as s) and list_stats_due
+def _list_stats_cols(list_id, user_id):
+    scope = f"d.list_id = {list_id} AND d.user_id = {user_id}"
+    return f"""
+        IFNULL(s.total, 0) AS total, IFNULL(s.done, 0) AS done,
+        (SELECT IFNULL(SUM(d.open), 0) FROM list_stats_due d WHERE {scope} AND d.due < :now) AS overdue,
+        (SELECT MIN(d.due) FROM list_stats_due d WHERE {scope} AND d.due >= :now) AS next_due
+    """
+
+def fetch_user_lists(user_id, include_personal=False):
+    """Lists the user belongs to, with total/done/overdue/next_due counters. include_personal
+    puts the personal bucket first, as a row with id NULL."""
+    personal = f"""
+        SELECT NULL AS id, 'Personal' AS name, :user AS owner_id, 0 AS is_collab, 1 AS is_owner,
+               {_list_stats_cols(0, ':user')}, 0 AS grp
+        FROM (SELECT 1) LEFT JOIN list_stats s ON s.list_id = 0 AND s.user_id = :user
+        UNION ALL
+    """ if include_personal else ""
+    return query_db(
         TASK_DB,
-        """
-        SELECT l.id, l.name, l.owner_id, l.is_collab,
-               CASE WHEN l.owner_id=? THEN 1 ELSE 0 END AS is_owner
-        FROM lists l
-        JOIN list_members m ON m.list_id = l.id
-        WHERE m.user_id = ?
-        ORDER BY l.name
+        f"""
+        SELECT id, name, owner_id, is_collab, is_owner, total, done, overdue, next_due FROM (
+            {personal}
+            SELECT l.id, l.name, l.owner_id, l.is_collab,
+                   CASE WHEN l.owner_id=:user THEN 1 ELSE 0 END AS is_owner,
+                   {_list_stats_cols('l.id', 0)}, 1 AS grp
+            FROM lists l
+            JOIN list_members m ON m.list_id = l.id
+            LEFT JOIN list_stats s ON s.list_id = l.id AND s.user_id = 0
+            WHERE m.user_id = :user
+        )
+        ORDER BY grp, name
         """,
-        (user_id, user_id),
+        {"user": user_id, "now": datetime.datetime.now().strftime("%Y-%m-%dT%H:%M")},
     )
-    return jsonify([dict(r) for r in rows])
+
+def check_list_stats(conn, fix=True):
+    """Compare list_stats/list_stats_due with a fresh count over tasks (and tasks_archive) and
+    (with fix) rebuild them.
+    Returns the drifted entries as (table, key, stored, expected)."""
+    drift = []
+    checks = (
+        ("list_stats", "SELECT list_id, user_id, total, done FROM list_stats WHERE total != 0 OR done != 0",
+         LIST_STATS_RECOUNT, 2),
+        ("list_stats_due", "SELECT list_id, user_id, due, open FROM list_stats_due WHERE open != 0",
+         f"SELECT {_stats_scope('')}, {_stats_due('')}, COUNT(*) FROM tasks "
+         f"WHERE {_stats_due('')} IS NOT NULL AND IFNULL(done, 0) = 0 GROUP BY 1, 2, 3", 3),
+    )
+    for table, stored_sql, expected_sql, key_len in checks:
+        stored = {tuple(r[:key_len]): tuple(r[key_len:]) for r in conn.execute(stored_sql)}
+        expected = {tuple(r[:key_len]): tuple(r[key_len:]) for r in conn.execute(expected_sql)}
+        for key in sorted(stored.keys() | expected.keys(), key=repr):
+            if stored.get(key) != expected.get(key):
+                drift.append((table, key, stored.get(key), expected.get(key)))
+    if fix:
+        for sql in LIST_STATS_REBUILD_ALL:
+            conn.execute(sql)
+    return drift
+
+@app.cli.command("check-list-stats")
+@click.option("--dry-run", is_flag=True, help="only report drift, don't rebuild")
+def check_list_stats_command(dry_run):
+    """Recount list_stats from tasks and tasks_archive, report drift and rebuild the counters."""
+    with db_transaction(TASK_DB) as conn:
+        drift = check_list_stats(conn, fix=not dry_run)
+    for table, key, stored, expected in drift:
+        click.echo(f"{table} {key}: stored {stored}, expected {expected}")
+    click.echo(f"{len(drift)} drifted entries" + ("" if dry_run or not drift else ", rebuilt"))
 
 @app.route("/lists", methods=["POST"])
 def create_list():
@@ -391,17 +2763,14 @@ def create_list():
     name = (data.get("name") or "").strip()
     if not name:
         return jsonify({"ok": False, "error": "List name required"}), 400
-    # Create collab list
-    query_db(TASK_DB, "INSERT INTO lists (owner_id, name, is_collab) VALUES (?, ?, 1)", (user_id, name))
-    # Fetch created id
-    row = query_db(TASK_DB, "SELECT id FROM lists WHERE owner_id=? AND name=? ORDER BY id DESC", (user_id, name), one=True)
-    list_id = row["id"]
-    # Add owner as member
-    try:
-    # ADD MEMBERS
-        query_db(TASK_DB, "INSERT OR IGNORE INTO list_members (list_id, user_id) VALUES (?, ?)", (list_id, user_id))
-    except Exception:
-        pass
+    # Create collab list, owner is its first member (one transaction)
+    def insert_list(conn):
+        list_id = _fetch(conn, "INSERT INTO lists (owner_id, name, is_collab) VALUES (?, ?, 1) RETURNING id",
+                         (user_id, name))[0]["id"]
+        _fetch(conn, "INSERT OR IGNORE INTO list_members (list_id, user_id) VALUES (?, ?)", (list_id, user_id))
+        return list_id
+    list_id = write_transaction(TASK_DB, insert_list)
+    membership_cache.invalidate((user_id, list_id))
     return jsonify({"message": "List created", "id": list_id}), 201
 
 #ADD NEW MEMBERS TO LISTT, called by share button
@@ -423,7 +2792,9 @@ def add_member(list_id):
     user = get_user_by_username(username)
     if not user:
         return jsonify({"ok": False, "error": "User not found"}), 404
-    query_db(TASK_DB, "INSERT OR IGNORE INTO list_members (list_id, user_id) VALUES (?, ?)", (list_id, user["id"]))
+    write_db(TASK_DB, "INSERT OR IGNORE INTO list_members (list_id, user_id) VALUES (?, ?)", (list_id, user["id"]))
+    membership_cache.invalidate((user["id"], list_id))
+    events.publish(list_id, "members", {"op": "added", "user_id": user["id"], "username": user["username"]})
     return jsonify({"message": "Member added"}), 200
 
 @app.route("/lists/<int:list_id>/members", methods=["GET"])
@@ -447,10 +2818,11 @@ def list_members_endpoint(list_id):
         """,
         (list_id,)
     )
-    # Pull usernames from accounts DB
+    # Pull usernames from accounts DB (one query for whatever isn't cached)
+    users = get_users_by_id([m["user_id"] for m in members])
     results = []
     for m in members:
-        user = query_db(ACCOUNTS_DB, "SELECT username FROM users WHERE id=?", (m["user_id"],), one=True)
+        user = users.get(m["user_id"])
         username = user["username"] if user else f"user-{m['user_id']}"
         results.append({"user_id": m["user_id"], "is_owner": m["is_owner"], "username": username})
     # Sort owner first, then username
@@ -470,15 +2842,157 @@ def remove_member(list_id, member_id):
         return ("Forbidden", 403)
     if member_id == row["owner_id"]:
         return jsonify({"ok": False, "error": "Owner cannot be removed."}), 400
-    query_db(TASK_DB, "DELETE FROM list_members WHERE list_id=? AND user_id=?", (list_id, member_id))
+    write_db(TASK_DB, "DELETE FROM list_members WHERE list_id=? AND user_id=?", (list_id, member_id))
+    membership_cache.invalidate((member_id, list_id))
+    events.publish(list_id, "members", {"op": "removed", "user_id": member_id})
+    events.revoke(list_id, member_id)
     return jsonify({"message": "Member removed"}), 200
 
+@app.route("/reminders/events", methods=["GET"])
+def reminder_events():
+    if "user_id" not in session:
+        return ("Unauthorized", 401)
+    user_id = session["user_id"]
+    sub, resync = events.subscribe(reminder_channel(user_id), user_id, request.headers.get("Last-Event-ID"))
+    return app.response_class(
+        events.stream(sub, resync),
+        mimetype="text/event-stream",
+        headers={"X-Accel-Buffering": "no"},
+    )
+
+@app.route("/lists/<int:list_id>/events", methods=["GET"])
+def list_events(list_id):
+    if "user_id" not in session:
+        return ("Unauthorized", 401)
+    user_id = session["user_id"]
+    if not is_member(user_id, list_id):
+        return ("Forbidden", 403)
+    sub, resync = events.subscribe(list_id, user_id, request.headers.get("Last-Event-ID"))
+    return app.response_class(
+        events.stream(sub, resync),
+        mimetype="text/event-stream",
+        headers={"X-Accel-Buffering": "no"},
+    )
+
+
+# --- Static assets ---
+# url_for('static', ...) gets ?v=<content hash> appended, so templates emit a new URL whenever a
+# file changes and the browser can keep the old one forever. files are read, hashed and
+# compressed once (re-read when their mtime changes) and served from memory
+STATIC_MAX_AGE = 365 * 24 * 3600
+STATIC_COMPRESS = (".js", ".css", ".html", ".svg", ".json", ".txt")
+
+
+class StaticAsset:
+    def __init__(self, path, mtime):
+        with open(path, "rb") as f:
+            self.data = f.read()
+        self.mtime = mtime
+        self.digest = hashlib.sha256(self.data).hexdigest()[:12]
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.variants = {}  # encoding -> bytes, only kept when smaller than the original
+        if path.endswith(STATIC_COMPRESS):
+            # preference order for equally acceptable encodings: br first, it's smaller
+            candidates = {"br": brotli.compress(self.data, quality=11)} if brotli else {}
+            candidates["gzip"] = gzip.compress(self.data, 9, mtime=0)
+            self.variants = {enc: body for enc, body in candidates.items() if len(body) < len(self.data)}
+
+
+_static_assets = {}
+
+def get_static_asset(filename):
+    path = safe_join(app.static_folder, filename)
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not os.path.isfile(path):
+        return None
+    asset = _static_assets.get(filename)
+    if asset is None or asset.mtime != st.st_mtime:
+        asset = _static_assets[filename] = StaticAsset(path, st.st_mtime)
+    return asset
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    if endpoint == "static" and "v" not in values:
+        asset = get_static_asset(values.get("filename", ""))
+        if asset:
+            values["v"] = asset.digest
+
+def serve_static(filename):
+    asset = get_static_asset(filename)
+    if asset is None:
+        abort(404)
+    encoding = request.accept_encodings.best_match(list(asset.variants)) if asset.variants else None
+    resp = app.response_class(asset.variants.get(encoding, asset.data), mimetype=asset.mimetype)
+    if asset.variants:
+        resp.vary.add("Accept-Encoding")
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.set_etag(asset.digest + (f"-{encoding}" if encoding else ""))
+    resp.last_modified = asset.mtime
+    if request.args.get("v") == asset.digest:
+        resp.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}, immutable"
+    else:
+        # unversioned (or outdated) URL: fine to keep, but revalidate with the ETag
+        resp.headers["Cache-Control"] = "public, no-cache"
+    return resp.make_conditional(request)
+
+app.view_functions["static"] = serve_static
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return ("Forbidden", 403)
+    return app.response_class(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# task/list JSON (and the page with the initial state) above this size gets gzip (or br)
+# when the client accepts it
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+COMPRESS_PATHS = ("/tasks", "/lists")
 
 @app.after_request
 def add_no_cache_headers(response):
-    response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
+    if "Cache-Control" in response.headers:
+        return response  # static files set their own
+    if response.headers.get("ETag"):
+        # browser may keep it but has to revalidate with If-None-Match every time
+        response.headers["Cache-Control"] = "private, no-cache"
+    elif "user_id" in session or response.is_json:
+        # logged in pages and API answers are never stored
+        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
+        response.headers["Pragma"] = "no-cache"
+        response.headers["Expires"] = "0"
+    else:
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@app.after_request
+def compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or not (request.path.startswith(COMPRESS_PATHS) or request.endpoint == "home")):
+        return response
+    response.vary.add("Accept-Encoding")
+    if (response.content_length or 0) < COMPRESS_MIN_SIZE:
+        return response
+    encoding = request.accept_encodings.best_match(["br", "gzip"] if brotli else ["gzip"])
+    if not encoding:
+        return response
+    # fast settings, this runs on every request
+    data = response.get_data()
+    response.set_data(brotli.compress(data, quality=4) if encoding == "br" else gzip.compress(data, 6, mtime=0))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # the bytes differ from the uncompressed ones, so the ETag can only be weak now.
+        # If-None-Match compares weakly, the 304 check in conditional_json still matches
+        response.set_etag(etag, weak=True)
     return response
 
 
@@ -487,4 +3001,10 @@ if __name__ == "__main__":
     init_accounts_db()
     port = int(os.environ.get("PORT", 8080))
     debug = os.environ.get("FLASK_DEBUG", "0") == "1"
+    # with the debug reloader only the child process (WERKZEUG_RUN_MAIN set) serves requests
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN"):
+        if REMINDERS:
+            reminders.start()
+        if ARCHIVE:
+            compactor.start()
     app.run(host="0.0.0.0", port=port, debug=debug)
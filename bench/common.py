@@ -0,0 +1,117 @@
+"""Helpers shared by the bench scripts."""
+import contextlib
+import json
+import http.cookiejar
+import os
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import app
+
+# statements that touch data; BEGIN/COMMIT/PRAGMA and trigger bodies ("-- TRIGGER") are skipped
+DATA_STATEMENTS = ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+
+
+def trace_statements(on_statement):
+    """Call on_statement(db_file, sql) for every data statement run on a pooled connection
+    opened from now on. Returns a function that undoes the patch."""
+    original = app.ConnectionPool._connect
+
+    def traced_connect(pool):
+        conn = original(pool)
+
+        def trace(sql):
+            sql = " ".join(sql.split())
+            if sql.upper().startswith(DATA_STATEMENTS):
+                on_statement(pool.db_file, sql)
+
+        conn.set_trace_callback(trace)
+        return conn
+
+    app.close_pools()  # so already pooled connections get traced too
+    app.ConnectionPool._connect = traced_connect
+    return lambda: setattr(app.ConnectionPool, "_connect", original)
+
+
+def count_statements(on_statement):
+    """Call on_statement(sql) for every data statement sent through execute/executemany on
+    pooled connections opened from now on (executemany counts once, trigger bodies not at
+    all). Returns a function that undoes the patch."""
+    class CountingConnection(app.ConnectionPool.connection_class):
+        def execute(self, sql, *args):
+            if sql.lstrip().upper().startswith(DATA_STATEMENTS):
+                on_statement(sql)
+            return super().execute(sql, *args)
+
+        def executemany(self, sql, *args):
+            if sql.lstrip().upper().startswith(DATA_STATEMENTS):
+                on_statement(sql)
+            return super().executemany(sql, *args)
+
+    original = app.ConnectionPool.connection_class
+    app.close_pools()
+    app.ConnectionPool.connection_class = CountingConnection
+    return lambda: setattr(app.ConnectionPool, "connection_class", original)
+
+
+@contextlib.contextmanager
+def temp_databases():
+    """Point the app at fresh tasks.db / accounts.db in a temp dir for the duration."""
+    saved = app.TASK_DB, app.ACCOUNTS_DB
+    with tempfile.TemporaryDirectory() as tmp:
+        app.TASK_DB = os.path.join(tmp, "tasks.db")
+        app.ACCOUNTS_DB = os.path.join(tmp, "accounts.db")
+        app.init_task_db()
+        app.init_accounts_db()
+        try:
+            yield tmp
+        finally:
+            app.stop_write_queues()
+            app.close_pools()
+            app.user_cache.clear()
+            app.membership_cache.clear()
+            app.TASK_DB, app.ACCOUNTS_DB = saved
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+# --- HTTP (urllib, one cookie jar per simulated browser) ---
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # report the 302 itself instead of following it
+
+
+def opener():
+    return urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+
+def http_request(client, method, url, json_body=None, form=None, raw=None):
+    """Send a request, return (status, body bytes). HTTP errors are returned, not raised.
+    raw is a (content type, bytes) body."""
+    headers = {"Accept": "application/json"}
+    data = None
+    if json_body is not None:
+        data = json.dumps(json_body).encode()
+        headers["Content-Type"] = "application/json"
+    elif form is not None:
+        data = urllib.parse.urlencode(form).encode()
+    elif raw is not None:
+        headers["Content-Type"], data = raw
+    req = urllib.request.Request(url, data=data, method=method, headers=headers)
+    try:
+        with client.open(req) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def post_form(client, url, **form):
+    return http_request(client, "POST", url, form=form)[0]
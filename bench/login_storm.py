@@ -0,0 +1,104 @@
+"""/tasks latency while a burst of logins is hashing passwords.
+
+Starts the app on a local port (throwaway dbs), measures GET /tasks latency on its own,
+then again while --storm threads log in as fast as they can. Runs once with hashing on the
+request thread (HASH_WORKERS=0) and once with the process pool.
+
+Run from the repo root:  python -m bench.login_storm [--storm 16] [--seconds 5]
+"""
+import argparse
+import logging
+import statistics
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+import app
+from bench.common import opener, post_form, temp_databases
+
+
+def measure_tasks(client, base, seconds):
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        with client.open(f"{base}/tasks") as resp:
+            resp.read()
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.01)
+    latencies.sort()
+    return {
+        "n": len(latencies),
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "max": latencies[-1],
+    }
+
+
+def run(base, storm, seconds):
+    reader = opener()
+    post_form(reader, f"{base}/auth", action="login", username="reader", password="pw")
+    quiet = measure_tasks(reader, base, seconds)
+
+    stop = threading.Event()
+    codes = {}
+    lock = threading.Lock()
+
+    def login_loop():
+        client = opener()
+        while not stop.is_set():
+            code = post_form(client, f"{base}/auth", action="login", username="stormer", password="pw")
+            with lock:
+                codes[code] = codes.get(code, 0) + 1
+            if code == 200:
+                client = opener()  # log in again from a fresh session
+
+    threads = [threading.Thread(target=login_loop, daemon=True) for _ in range(storm)]
+    for t in threads:
+        t.start()
+    time.sleep(0.5)
+    loaded = measure_tasks(reader, base, seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return quiet, loaded, codes
+
+
+def fmt(stats):
+    return f"p50 {stats['p50']:7.2f} ms  p95 {stats['p95']:7.2f} ms  max {stats['max']:7.2f} ms  (n={stats['n']})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--storm", type=int, default=16, help="concurrent login threads")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=app.HASH_WORKERS or 2, help="hash pool size")
+    opts = parser.parse_args()
+
+    with temp_databases():
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no per-request access log
+        server = make_server("127.0.0.1", 0, app.app, threaded=True)
+        base = f"http://127.0.0.1:{server.server_port}"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        setup = opener()
+        for name in ("reader", "stormer"):
+            post_form(setup, f"{base}/auth", action="signup", username=name, password="pw", name=name, security="s")
+        for i in range(50):
+            app.query_db(app.TASK_DB, "INSERT INTO tasks (user_id, title, createdAt) VALUES (1, ?, ?)",
+                         (f"task {i}", f"2025-01-01T00:00:{i:02d}"))
+
+        app.hasher.shutdown()
+        for label, workers in (("inline hashing", 0), (f"pool ({opts.workers} procs)", opts.workers)):
+            app.hasher = app.HashService(workers=workers)
+            quiet, loaded, codes = run(base, opts.storm, opts.seconds)
+            app.hasher.shutdown()
+            print(f"{label:<18} quiet : {fmt(quiet)}")
+            print(f"{label:<18} storm : {fmt(loaded)}  logins {dict(sorted(codes.items()))}")
+
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
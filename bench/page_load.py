@@ -0,0 +1,96 @@
+"""Time until the To-Do page has its data: initial state embedded in / vs. fetched after load.
+
+Starts the app on a local port with a seeded temp dataset and replays what the browser does
+before it can render the task list:
+  fetch     GET /, then GET /lists, then GET /tasks (the old script.js, one after the other)
+  parallel  GET /, then GET /lists and GET /tasks at the same time (script.js fallback)
+  hydrate   GET / only, lists and first task page come embedded in the page
+Every request waits --rtt ms first to stand in for network round trips (static files are
+left out, they're cached immutable after the first visit).
+
+Run from the repo root:  python -m bench.page_load [--rtt 0,50,150] [--runs 30]
+"""
+import argparse
+import json
+import logging
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import make_server
+
+import app
+from bench.common import http_request, opener, post_form, temp_databases
+from bench.seed import add_size_args, seed, size_kwargs
+
+INITIAL_STATE = re.compile(rb'<script id="initialState" type="application/json">(.*?)</script>', re.S)
+LISTS_URL = "/lists?include_personal=1"
+TASKS_URL = "/tasks?" + "&".join(f"{k}={v}" for k, v in app.HOME_TASKS_PAGE.items())
+
+
+def get(client, url, rtt):
+    time.sleep(rtt)
+    status, body = http_request(client, "GET", url)
+    assert status == 200, (url, status)
+    return body
+
+
+def fetch(client, base, rtt, pool):
+    get(client, base + "/", rtt)
+    json.loads(get(client, base + LISTS_URL, rtt))
+    json.loads(get(client, base + TASKS_URL, rtt))
+
+
+def parallel(client, base, rtt, pool):
+    get(client, base + "/", rtt)
+    for body in pool.map(lambda path: get(client, base + path, rtt), (LISTS_URL, TASKS_URL)):
+        json.loads(body)
+
+
+def hydrate(client, base, rtt, pool):
+    state = json.loads(INITIAL_STATE.search(get(client, base + "/", rtt)).group(1))
+    assert state["tasks"]["items"], "no tasks embedded"
+
+
+FLOWS = {"fetch": fetch, "parallel": parallel, "hydrate": hydrate}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rtt", default="0,50,150", help="comma separated round trip times in ms")
+    parser.add_argument("--runs", type=int, default=30)
+    add_size_args(parser)
+    opts = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no per-request access log
+    with temp_databases():
+        data = seed(app.TASK_DB, app.ACCOUNTS_DB, **size_kwargs(opts))
+        server = make_server("127.0.0.1", 0, app.app, threaded=True)
+        base = f"http://127.0.0.1:{server.server_port}"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client = opener()
+        post_form(client, f"{base}/auth", action="login", username="user0", password="pw")
+        print(f"{data['tasks']} tasks seeded, logged in as user0")
+        print(f"{'rtt ms':>7}" + "".join(f"{name:>14}" for name in FLOWS) + "   (median ms until data)")
+        try:
+            with ThreadPoolExecutor(2) as pool:
+                for rtt in (float(r) / 1000 for r in opts.rtt.split(",")):
+                    row = []
+                    for flow in FLOWS.values():
+                        flow(client, base, rtt, pool)  # warm up
+                        times = []
+                        for _ in range(opts.runs):
+                            start = time.perf_counter()
+                            flow(client, base, rtt, pool)
+                            times.append((time.perf_counter() - start) * 1000)
+                        row.append(statistics.median(times))
+                    print(f"{rtt * 1000:7.0f}" + "".join(f"{t:14.2f}" for t in row))
+        finally:
+            server.shutdown()
+            app.hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
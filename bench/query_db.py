@@ -0,0 +1,69 @@
+"""Compare the pooled query_db against the old connect-per-statement path.
+
+Run from the repo root:  python -m bench.query_db [--rows 5000] [--iterations 2000]
+Uses a throwaway copy of the schema in a temp dir, the real tasks.db is not touched.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import app
+
+
+def legacy_query_db(db_file, query, args=(), one=False):
+    # the original helper: new connection, one statement, commit, close
+    with sqlite3.connect(db_file) as conn:
+        conn.row_factory = sqlite3.Row
+        cur = conn.execute(query, args)
+        rows = cur.fetchall()
+        conn.commit()
+    return (rows[0] if rows else None) if one else rows
+
+
+def seed(db_file, rows):
+    app.TASK_DB = db_file
+    app.init_task_db()
+    with sqlite3.connect(db_file) as conn:
+        conn.executemany(
+            "INSERT INTO tasks (user_id, list_id, title, priority, createdAt) VALUES (?, ?, ?, ?, ?)",
+            [(i % 50 + 1, None, f"task {i}", "Low", "2025-01-01T00:00:00") for i in range(rows)],
+        )
+
+
+def workload(fn, db_file, iterations):
+    # roughly what a PATCH /tasks/<id> does: read the task, check membership, write
+    start = time.perf_counter()
+    for i in range(iterations):
+        task_id = i % 1000 + 1
+        fn(db_file, "SELECT * FROM tasks WHERE id=?", (task_id,), one=True)
+        fn(db_file, "SELECT 1 FROM list_members WHERE list_id=? AND user_id=?", (1, 1))
+        fn(db_file, "UPDATE tasks SET done=? WHERE id=?", (i % 2, task_id))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    opts = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = os.path.join(tmp, "legacy.db")
+        pooled_db = os.path.join(tmp, "pooled.db")
+        seed(legacy_db, opts.rows)
+        seed(pooled_db, opts.rows)
+
+        legacy = workload(legacy_query_db, legacy_db, opts.iterations)
+        pooled = workload(app.query_db, pooled_db, opts.iterations)
+        app.close_pools()
+
+    per_req = lambda total: total / opts.iterations * 1000
+    print(f"legacy  connect-per-statement: {legacy:.3f}s  ({per_req(legacy):.3f} ms/request)")
+    print(f"pooled  WAL + reused conns   : {pooled:.3f}s  ({per_req(pooled):.3f} ms/request)")
+    print(f"speedup: {legacy / pooled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Query-plan regression check for every route's SQL.
+
+Drives each route through the Flask test client against a seeded throwaway db,
+traces every statement run on a pooled connection, then runs EXPLAIN QUERY PLAN on it.
+Exits non-zero if any statement does a full table scan.
+
+Run from the repo root:  python -m bench.query_plans [-v]
+"""
+import argparse
+import datetime
+import os
+import re
+import sqlite3
+import sys
+
+import app
+from bench.common import temp_databases, trace_statements
+
+# "SCAN <table>" without an index is a full table scan. "SCAN x USING (COVERING) INDEX"
+# walks an index instead and is fine
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?! USING (?:COVERING )?INDEX)(?: AS \w+)?$")
+
+
+# literals in the traced (expanded) sql, replaced with ? to group statements by shape
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|\bNULL\b")
+
+
+def record_statements():
+    """Returns ({(db, shape): first sql seen}, restore)."""
+    seen = {}
+    restore = trace_statements(lambda db_file, sql: seen.setdefault((db_file, LITERAL.sub("?", sql)), sql))
+    return seen, restore
+
+
+def login(client, username):
+    form = dict(action="signup", username=username, password="pw", name=username, security="blue")
+    client.post("/auth", data=form, headers={"Accept": "application/json"})
+    form = dict(action="login", username=username, password="pw")
+    client.post("/auth", data=form, headers={"Accept": "application/json"})
+
+
+def drive_routes():
+    owner, member = app.app.test_client(), app.app.test_client()
+    login(owner, "owner")
+    login(member, "member")
+    member_id = app.get_user_by_username("member")["id"]
+
+    list_id = owner.post("/lists", json={"name": "team"}).get_json()["id"]
+    owner.post(f"/lists/{list_id}/members", json={"username": "member"})
+    owner.post("/tasks", json={"title": "personal", "dueDate": "2025-01-01"})
+    soon = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+    owner.post("/tasks", json={"title": "soon", "dueDate": soon, "dueTime": "09:00"})
+    owner.post("/tasks", json={"title": "later", "dueDate": soon, "dueTime": "10:00"})
+    member.post("/tasks", json={"title": "shared", "list_id": list_id, "dueDate": soon})
+    member.post("/tasks", json={"title": "shared later", "list_id": list_id, "dueDate": soon})
+    for i, priority in enumerate(("High", "Mid", "Low")):
+        owner.post("/tasks", json={"title": f"p{i}", "priority": priority})
+        owner.post("/tasks", json={"title": f"s{i}", "priority": priority, "list_id": list_id})
+    owner.get("/")
+    owner.get("/lists")
+    owner.get("/lists?include_personal=1")
+    owner.get("/tasks")
+    owner.get("/tasks?since=0")
+    owner.get(f"/tasks?since=0&list_id={list_id}")
+    archived_id = owner.get('/tasks').get_json()[0]['id']
+    owner.patch(f"/tasks/{archived_id}", json={"done": 1})
+    # archive it right away. not compact_tasks(): its ANALYZE over this handful of rows
+    # would leave stats that make the planner prefer scans everywhere
+    cutoff = (datetime.datetime.now() + datetime.timedelta(days=1)).isoformat()
+    app.write_transaction(app.TASK_DB, lambda conn: app.archive_batch(conn, cutoff, 10))
+    for sort in app.TASK_SORT_KEYS:
+        for path in ("/tasks", f"/tasks?list_id={list_id}"):
+            sep = "&" if "?" in path else "?"
+            first = owner.get(f"{path}{sep}sort={sort}&done=0&limit=1")
+            owner.get(f"{path}{sep}sort={sort}&limit=1&cursor={first.headers.get('X-Next-Cursor', '')}")
+            first = owner.get(f"{path}{sep}sort={sort}&include_archived=1&limit=1")
+            owner.get(f"{path}{sep}sort={sort}&include_archived=1&limit=1"
+                      f"&cursor={first.headers.get('X-Next-Cursor', '')}")
+    owner.patch(f"/tasks/{archived_id}", json={"done": 0})  # moves it back out of the archive
+    first = owner.get("/tasks/search?q=p&limit=1")
+    owner.get(f"/tasks/search?q=p&limit=1&done=0&cursor={first.headers.get('X-Next-Cursor', '')}")
+    owner.get(f"/tasks/search?q=s1&list_id={list_id}")
+    for path in ("/tasks/upcoming", "/tasks/overdue"):
+        for scope in ("", f"&list_id={list_id}"):
+            first = owner.get(f"{path}?limit=1{scope}")
+            owner.get(f"{path}?limit=1&cursor={first.headers.get('X-Next-Cursor', '')}{scope}")
+    scheduler = app.ReminderScheduler()
+    scheduler.poll()
+    rows = owner.get(f"/tasks?list_id={list_id}").get_json()
+    task_id = rows[0]["id"]
+    owner.patch(f"/tasks/{task_id}", json={"done": 1})
+    owner.delete(f"/tasks/{task_id}")
+    owner.post("/tasks/batch", json={"ops": [
+        {"op": "create", "title": "b1", "list_id": list_id},
+        {"op": "update", "id": rows[-1]["id"], "done": 1},
+    ]})
+    owner.get("/export").get_data()
+    owner.get("/export?format=csv").get_data()
+    owner.post("/import", data='{"title": "i1"}\n{"title": "i2", "list_id": %d}\n' % list_id,
+               content_type="application/x-ndjson")
+    owner.get(f"/lists/{list_id}/members")
+    owner.delete(f"/lists/{list_id}/members/{member_id}")
+    owner.get("/profile")
+    owner.post("/profile", data={"name": "Owner", "username": "owner"})
+    owner.post("/forgot", data={"username": "owner", "security": "blue", "new_password": "pw"},
+               headers={"Accept": "application/json"})
+    app.prune_tombstones(days=-1)
+    owner.get("/tasks?since=0")  # older than the pruned tombstones: 410
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    opts = parser.parse_args()
+
+    with temp_databases():
+        app.app.config["TESTING"] = True
+
+        seen, restore = record_statements()
+        try:
+            drive_routes()
+        finally:
+            restore()
+            app.close_pools()
+
+        failures = 0
+        for (db_file, shape), sql in seen.items():
+            with sqlite3.connect(db_file) as conn:
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+            scans = [line for line in plan if FULL_SCAN.match(line)]
+            if scans or opts.verbose:
+                failures += bool(scans)
+                print(f"{'FULL SCAN' if scans else 'ok':<9} [{os.path.basename(db_file)}] {shape}")
+                for line in plan:
+                    print(f"    {line}")
+
+    print(f"{len(seen)} statements checked, {failures} full scans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""Benchmark every route against seeded data.
+
+Seeds throwaway dbs (see bench.seed), then sends --requests requests to each route,
+first through the Flask test client (one worker, no network) and then over real HTTP to
+an in-process threaded server with --workers concurrent clients. Reports throughput,
+p50/p95/p99 latency and SQL statements per request, and writes everything to --out.
+
+GET /lists/<id>/events is left out: it is a long-lived stream, not a request/response.
+
+Run from the repo root:
+    python -m bench.run [--mode client|http|both] [--requests 200] [--workers 8] [--out bench.json]
+    python -m bench.run --compare old.json new.json
+"""
+import argparse
+import datetime
+import json
+import logging
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import make_server
+
+import app
+from bench.common import count_statements, http_request, opener, percentile, temp_databases
+from bench.seed import add_size_args, seed, size_kwargs
+
+
+# --- scenarios ---
+# name -> (build(ctx, i) -> (method, path, {"json"/"form"/"raw": body}), session) where session is
+# "user" (logged in as the worker's user) or "fresh" (new anonymous session every request)
+USER, FRESH = "user", "fresh"
+
+IMPORT_BODY = "".join(
+    json.dumps({"title": f"imported {n}", "priority": "Low", "done": n % 2}) + "\n" for n in range(100)
+).encode()
+
+SCENARIOS = {
+    "GET /": (lambda ctx, i: ("GET", "/", {}), USER),
+    "GET /auth": (lambda ctx, i: ("GET", "/auth", {}), FRESH),
+    "GET /metrics": (lambda ctx, i: ("GET", "/metrics", {}), FRESH),
+    "POST /auth (login)": (lambda ctx, i: ("POST", "/auth", {"form": {
+        "action": "login", "username": ctx["username"], "password": "pw"}}), FRESH),
+    "POST /forgot": (lambda ctx, i: ("POST", "/forgot", {"form": {
+        "username": ctx["username"], "security": "blue", "new_password": "pw"}}), FRESH),
+    "GET /profile": (lambda ctx, i: ("GET", "/profile", {}), USER),
+    "POST /profile": (lambda ctx, i: ("POST", "/profile", {"form": {
+        "name": ctx["username"], "username": ctx["username"]}}), USER),
+    "GET /tasks": (lambda ctx, i: ("GET", "/tasks", {}), USER),
+    "GET /tasks?sort=dueDate&done=0": (lambda ctx, i: ("GET", "/tasks?sort=dueDate&done=0&limit=50", {}), USER),
+    "GET /tasks?include_archived": (lambda ctx, i: ("GET", "/tasks?include_archived=1&limit=50", {}), USER),
+    "GET /tasks?list_id": (lambda ctx, i: ("GET", f"/tasks?list_id={ctx['list_id']}", {}), USER),
+    "GET /tasks?since": (lambda ctx, i: ("GET", f"/tasks?since={ctx['since']}", {}), USER),
+    "GET /tasks/search": (lambda ctx, i: ("GET", "/tasks/search?q=milk", {}), USER),
+    "GET /tasks/search?list_id": (lambda ctx, i: ("GET", f"/tasks/search?q=pay%20re&list_id={ctx['list_id']}", {}), USER),
+    "GET /tasks/upcoming": (lambda ctx, i: ("GET", "/tasks/upcoming?days=30", {}), USER),
+    "GET /tasks/overdue?list_id": (lambda ctx, i: ("GET", f"/tasks/overdue?list_id={ctx['list_id']}&limit=50", {}), USER),
+    "POST /tasks": (lambda ctx, i: ("POST", "/tasks", {"json": {
+        "title": f"bench {i}", "dueDate": "2025-06-01", "dueTime": "09:00", "priority": "Mid"}}), USER),
+    "PATCH /tasks/<id>": (lambda ctx, i: ("PATCH", f"/tasks/{ctx['task_ids'][i % len(ctx['task_ids'])]}",
+                                          {"json": {"done": i % 2}}), USER),
+    "DELETE /tasks/<id>": (lambda ctx, i: ("DELETE", f"/tasks/{ctx['delete_ids'].pop()}", {}), USER),
+    "POST /tasks/batch": (lambda ctx, i: ("POST", "/tasks/batch", {"json": {"ops": [
+        {"op": "update", "id": t, "done": i % 2} for t in ctx["task_ids"][:10]]}}), USER),
+    "GET /export": (lambda ctx, i: ("GET", "/export", {}), USER),
+    "GET /export?format=csv": (lambda ctx, i: ("GET", "/export?format=csv", {}), USER),
+    "POST /import": (lambda ctx, i: ("POST", "/import", {"raw": ("application/x-ndjson", IMPORT_BODY)}), USER),
+    "GET /lists": (lambda ctx, i: ("GET", "/lists", {}), USER),
+    "POST /lists": (lambda ctx, i: ("POST", "/lists", {"json": {"name": f"bench list {i}"}}), USER),
+    "GET /lists/<id>/members": (lambda ctx, i: ("GET", f"/lists/{ctx['list_id']}/members", {}), USER),
+    "POST /lists/<id>/members": (lambda ctx, i: ("POST", f"/lists/{ctx['list_id']}/members", {"json": {
+        "username": ctx["outsider_name"]}}), USER),
+    "DELETE /lists/<id>/members/<uid>": (lambda ctx, i: (
+        "DELETE", f"/lists/{ctx['list_id']}/members/{ctx['outsider']}", {}), USER),
+}
+
+
+def make_contexts(data, count, per_worker_deletes):
+    """One context per worker: an owner of a seeded list plus the ids its scenarios use."""
+    contexts = []
+    owners = {lid: members[0] for lid, members in data["members"].items()}
+    for w in range(count):
+        list_id = data["list_ids"][w % len(data["list_ids"])]
+        user_id = owners[list_id]
+        outsider = next(u for u in data["user_ids"] if u not in data["members"][list_id])
+        task_ids = [r["id"] for r in app.query_db(
+            app.TASK_DB, "SELECT id FROM tasks WHERE user_id=? AND list_id IS NULL LIMIT 200", (user_id,))]
+        delete_ids = [r["id"] for r in app.query_db(
+            app.TASK_DB,
+            "INSERT INTO tasks (user_id, title, createdAt) SELECT ?, 'to delete', '2025-01-01' "
+            "FROM (WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < ?) SELECT x FROM n) "
+            "RETURNING id",
+            (user_id, per_worker_deletes))]
+        contexts.append({
+            "user_id": user_id,
+            "username": app.get_users_by_id([user_id])[user_id]["username"],
+            "list_id": list_id,
+            "outsider": outsider,
+            "outsider_name": app.get_users_by_id([outsider])[outsider]["username"],
+            "task_ids": task_ids,
+            "delete_ids": delete_ids,
+            "since": app.current_sync_token(),
+        })
+    return contexts
+
+
+# --- transports ---
+class TestClientSession:
+    def __init__(self, logged_in_as=None):
+        self.client = app.app.test_client()
+        if logged_in_as:
+            self.request("POST", "/auth", form={"action": "login", "username": logged_in_as, "password": "pw"})
+
+    def request(self, method, path, json=None, form=None, raw=None):
+        headers = {"Accept": "application/json"}
+        data = form
+        if raw is not None:
+            headers["Content-Type"], data = raw
+        resp = self.client.open(path, method=method, json=json, data=data, headers=headers)
+        resp.get_data()  # drain streamed bodies (GET /export) so they count
+        resp.close()
+        return resp.status_code
+
+
+class HttpSession:
+    def __init__(self, base, logged_in_as=None):
+        self.base = base
+        self.client = opener()
+        if logged_in_as:
+            self.request("POST", "/auth", form={"action": "login", "username": logged_in_as, "password": "pw"})
+
+    def request(self, method, path, json=None, form=None, raw=None):
+        return http_request(self.client, method, self.base + path, json_body=json, form=form, raw=raw)[0]
+
+
+# --- runner ---
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, sql):
+        with self._lock:
+            self.count += 1
+
+
+def run_scenario(name, contexts, make_session, requests, workers, counter):
+    build, session_kind = SCENARIOS[name]
+    per_worker = max(1, requests // workers)
+    sessions = [make_session(ctx["username"]) if session_kind == USER else None for ctx in contexts[:workers]]
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def worker(w):
+        ctx, session = contexts[w], sessions[w]
+        local = []
+        for i in range(per_worker):
+            method, path, body = build(ctx, i)
+            if session_kind == FRESH:
+                session = make_session(None)
+            start = time.perf_counter()
+            status = session.request(method, path, **body)
+            local.append((time.perf_counter() - start) * 1000)
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+        with lock:
+            latencies.extend(local)
+
+    statements_before = counter.count
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(worker, range(workers)))
+    elapsed = time.perf_counter() - start
+    total = per_worker * workers
+    latencies.sort()
+    return {
+        "requests": total,
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "throughput": total / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "statements_per_request": (counter.count - statements_before) / total,
+    }
+
+
+def print_results(mode, results):
+    print(f"\n== {mode} ==")
+    print(f"{'route':<34} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'stmts':>6}  status")
+    for name, r in results.items():
+        print(f"{name:<34} {r['throughput']:>9.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['statements_per_request']:>6.1f}  {r['status']}")
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    for mode, results in new["results"].items():
+        before = old["results"].get(mode, {})
+        print(f"\n== {mode}: {old_path} -> {new_path} ==")
+        print(f"{'route':<34} {'req/s':>16} {'p95 ms':>18} {'stmts':>12}")
+        for name, r in results.items():
+            b = before.get(name)
+            if not b:
+                continue
+            change = (r["throughput"] / b["throughput"] - 1) * 100 if b["throughput"] else 0.0
+            print(f"{name:<34} {r['throughput']:>9.1f} ({change:+5.0f}%) "
+                  f"{b['p95_ms']:>8.2f} -> {r['p95_ms']:<7.2f} "
+                  f"{b['statements_per_request']:>4.1f} -> {r['statements_per_request']:<4.1f}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("client", "http", "both"), default="both")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent clients in http mode")
+    parser.add_argument("--routes", help="comma separated subset of route names")
+    parser.add_argument("--out", help="write results as JSON here")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    add_size_args(parser)
+    opts = parser.parse_args()
+
+    if opts.compare:
+        compare(*opts.compare)
+        return
+
+    names = [n.strip() for n in opts.routes.split(",")] if opts.routes else list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)}")
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no per-request access log
+    results = {}
+    with temp_databases():
+        data = seed(app.TASK_DB, app.ACCOUNTS_DB, **size_kwargs(opts))
+        counter = StatementCounter()
+        restore = count_statements(counter)
+        try:
+            modes = ("client", "http") if opts.mode == "both" else (opts.mode,)
+            for mode in modes:
+                workers = 1 if mode == "client" else opts.workers
+                contexts = make_contexts(data, workers, opts.requests)
+                if mode == "client":
+                    make_session = TestClientSession
+                    server = None
+                else:
+                    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+                    threading.Thread(target=server.serve_forever, daemon=True).start()
+                    base = f"http://127.0.0.1:{server.server_port}"
+                    make_session = lambda user: HttpSession(base, user)  # noqa: E731
+                try:
+                    results[mode] = {
+                        name: run_scenario(name, contexts, make_session, opts.requests, workers, counter)
+                        for name in names
+                    }
+                finally:
+                    if server:
+                        server.shutdown()
+                print_results(mode, results[mode])
+        finally:
+            restore()
+            app.hasher.shutdown()
+
+    if opts.out:
+        meta = {
+            "when": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "requests_per_route": opts.requests,
+            "workers": opts.workers,
+            "seed": size_kwargs(opts),
+        }
+        with open(opts.out, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"\nwrote {opts.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Fill tasks.db / accounts.db with synthetic users, lists, members and tasks.
+
+Every user gets the password "pw" and security answer "blue" (hashed once and reused,
+so seeding stays fast). Usernames are user0 .. user<N-1>.
+
+Run from the repo root:  python -m bench.seed --tasks-db /tmp/t.db --accounts-db /tmp/a.db [--users 100 ...]
+"""
+import argparse
+import datetime
+import random
+import sqlite3
+from contextlib import closing
+
+from werkzeug.security import generate_password_hash
+
+import app
+
+PRIORITIES = ("Low", "Mid", "High")
+# titles/descriptions are drawn from this so search has realistic term frequencies
+WORDS = (
+    "buy milk bread eggs call mom dentist email report review budget invoice pay rent book flight "
+    "hotel pack clean kitchen garage laundry fix bike car oil change renew passport license plan "
+    "party birthday gift order groceries water plants walk dog vet appointment meeting notes slides "
+    "prepare presentation update resume apply job interview schedule doctor pharmacy pick kids school "
+    "homework library return package ship sell desk chair paint fence mow lawn rake leaves repair roof "
+    "gutter backup laptop phone password bank transfer taxes receipts insurance claim cancel subscription "
+    "gym yoga run marathon train recipe dinner lunch cook soup bake cake write blog draft article edit "
+    "photos print album frame hang shelf assemble furniture donate clothes sort closet organize files"
+).split()
+
+
+def seed(tasks_db, accounts_db, users=50, lists=20, members=5, tasks_per_user=100,
+         tasks_per_list=200, done_ratio=0.3, rng_seed=1):
+    """Insert the data and return a summary dict with the ids the benchmarks need."""
+    rng = random.Random(rng_seed)
+    saved = app.TASK_DB, app.ACCOUNTS_DB
+    app.TASK_DB, app.ACCOUNTS_DB = tasks_db, accounts_db
+    try:
+        app.init_task_db()
+        app.init_accounts_db()
+    finally:
+        app.TASK_DB, app.ACCOUNTS_DB = saved
+
+    pw_hash = generate_password_hash("pw", app.PASSWORD_HASH_METHOD)
+    sec_hash = generate_password_hash("blue", app.PASSWORD_HASH_METHOD)
+    with closing(sqlite3.connect(accounts_db)) as conn, conn:
+        start = conn.execute("SELECT IFNULL(MAX(id), 0) FROM users").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO users (username, name, security, password_hash) VALUES (?, ?, ?, ?)",
+            [(f"user{start + i}", f"User {start + i}", sec_hash, pw_hash) for i in range(users)],
+        )
+        user_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE id > ? ORDER BY id", (start,))]
+
+    # due dates around today, so /tasks/upcoming and /tasks/overdue both have something to find
+    today = datetime.date.today()
+
+    def task_row(user_id, list_id, n):
+        day = rng.randint(1, 28)
+        due = today + datetime.timedelta(days=rng.randint(-180, 180))
+        return (
+            user_id, list_id, " ".join(rng.sample(WORDS, 3)) + f" #{n}", " ".join(rng.sample(WORDS, 8)),
+            due.isoformat() if rng.random() < 0.8 else None,
+            f"{rng.randint(0, 23):02d}:{rng.choice((0, 15, 30, 45)):02d}",
+            rng.choice(PRIORITIES), int(rng.random() < done_ratio),
+            f"2024-{rng.randint(1, 12):02d}-{day:02d}T{rng.randint(0, 23):02d}:00:00",
+        )
+
+    list_ids, memberships = [], {}
+    with closing(sqlite3.connect(tasks_db)) as conn, conn:
+        for i in range(lists):
+            owner = user_ids[i % len(user_ids)]
+            list_id = conn.execute("INSERT INTO lists (owner_id, name, is_collab) VALUES (?, ?, 1)",
+                                   (owner, f"list {i}")).lastrowid
+            others = [u for u in user_ids if u != owner]
+            member_ids = [owner] + rng.sample(others, min(members, len(others)))
+            conn.executemany("INSERT OR IGNORE INTO list_members (list_id, user_id) VALUES (?, ?)",
+                             [(list_id, u) for u in member_ids])
+            list_ids.append(list_id)
+            memberships[list_id] = member_ids
+
+        sql = ("INSERT INTO tasks (user_id, list_id, title, description, dueDate, dueTime, priority, done, createdAt) "
+               "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+        n = 0
+        for user_id in user_ids:
+            conn.executemany(sql, [task_row(user_id, None, n + k) for k in range(tasks_per_user)])
+            n += tasks_per_user
+        for list_id, member_ids in memberships.items():
+            conn.executemany(sql, [task_row(rng.choice(member_ids), list_id, n + k) for k in range(tasks_per_list)])
+            n += tasks_per_list
+        conn.execute("ANALYZE")
+
+    return {"user_ids": user_ids, "list_ids": list_ids, "members": memberships, "tasks": n}
+
+
+def add_size_args(parser):
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--lists", type=int, default=20)
+    parser.add_argument("--members", type=int, default=5, help="members per list besides the owner")
+    parser.add_argument("--tasks-per-user", type=int, default=100, help="personal tasks per user")
+    parser.add_argument("--tasks-per-list", type=int, default=200)
+
+
+def size_kwargs(opts):
+    return {"users": opts.users, "lists": opts.lists, "members": opts.members,
+            "tasks_per_user": opts.tasks_per_user, "tasks_per_list": opts.tasks_per_list}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks-db", required=True)
+    parser.add_argument("--accounts-db", required=True)
+    add_size_args(parser)
+    opts = parser.parse_args()
+    summary = seed(opts.tasks_db, opts.accounts_db, **size_kwargs(opts))
+    print(f"seeded {len(summary['user_ids'])} users, {len(summary['list_ids'])} lists, {summary['tasks']} tasks")
+
+
+if __name__ == "__main__":
+    main()
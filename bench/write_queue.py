@@ -0,0 +1,111 @@
+"""Concurrent task edits: per-statement commits vs. the WRITE_QUEUE group commit writer.
+
+Seeds a temp dataset, then --workers threads (each logged in as the owner of a collab list,
+spread over the seeded lists) hammer the write routes through the Flask test client: toggle
+done on a list task, add a list task, delete it again. Every run is done once with each
+request committing on its own (the default) and once with WRITE_QUEUE on, and reports
+throughput, latency percentiles and failed requests (e.g. "database is locked" 500s).
+
+--synchronous FULL makes every commit fsync (the app default is NORMAL: in WAL mode only
+checkpoints fsync), which is where batching commits pays off most.
+
+Run from the repo root:  python -m bench.write_queue [--workers 1,8,32] [--requests 200]
+"""
+import argparse
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+from bench.common import percentile, temp_databases
+from bench.seed import add_size_args, seed, size_kwargs
+
+
+def run(data, workers, requests):
+    owners = [(lid, members[0]) for lid, members in data["members"].items()]
+    latencies, failures = [], {}
+    lock = threading.Lock()
+
+    # log in up front, one at a time: password hashing isn't what's measured here
+    clients = []
+    for w in range(workers):
+        list_id, owner = owners[w % len(owners)]
+        client = app.app.test_client()
+        username = app.get_users_by_id([owner])[owner]["username"]
+        client.post("/auth", data={"action": "login", "username": username, "password": "pw"})
+        task_ids = [r["id"] for r in app.query_db(
+            app.TASK_DB, "SELECT id FROM tasks WHERE list_id=? LIMIT 50", (list_id,))]
+        clients.append((client, list_id, task_ids))
+
+    def worker(w):
+        client, list_id, task_ids = clients[w]
+        local, created = [], None
+        for i in range(requests):
+            if i % 3 == 0:
+                method, path, body = "PATCH", f"/tasks/{task_ids[i % len(task_ids)]}", {"done": i % 2}
+            elif created is None:
+                method, path, body = "POST", "/tasks", {"title": f"bench {w}-{i}", "list_id": list_id}
+            else:
+                method, path, body = "DELETE", f"/tasks/{created}", None
+            start = time.perf_counter()
+            resp = client.open(path, method=method, json=body)
+            local.append((time.perf_counter() - start) * 1000)
+            if resp.status_code >= 300:
+                with lock:
+                    failures[resp.status_code] = failures.get(resp.status_code, 0) + 1
+            elif method == "POST":
+                created = resp.get_json()["id"]
+            elif method == "DELETE":
+                created = None
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(worker, range(workers)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": latencies[-1],
+        "failures": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,8,32", help="comma separated concurrent clients per run")
+    parser.add_argument("--requests", type=int, default=200, help="write requests per client")
+    parser.add_argument("--synchronous", choices=("NORMAL", "FULL"), default="NORMAL")
+    add_size_args(parser)
+    opts = parser.parse_args()
+
+    logging.getLogger("app").setLevel(logging.ERROR)  # "database is locked" tracebacks
+    app.DB_PRAGMAS = tuple(p for p in app.DB_PRAGMAS if "synchronous" not in p) + (
+        f"PRAGMA synchronous={opts.synchronous}",)
+    app.app.config["PROPAGATE_EXCEPTIONS"] = False  # count errors as 500s, don't raise them
+
+    print(f"synchronous={opts.synchronous}, window {app.WRITE_BATCH_WINDOW_MS:g} ms, "
+          f"batch <= {app.WRITE_BATCH_SIZE}, {opts.requests} requests per client")
+    print(f"{'workers':>7}  {'mode':<18} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  failed")
+    for workers in (int(w) for w in opts.workers.split(",")):
+        for label, queued in (("per-statement", False), ("group commit", True)):
+            # fresh dataset per run so both modes start from the same rows
+            with temp_databases():
+                data = seed(app.TASK_DB, app.ACCOUNTS_DB, **size_kwargs(opts))
+                app.WRITE_QUEUE = queued
+                try:
+                    r = run(data, workers, opts.requests)
+                finally:
+                    app.WRITE_QUEUE = False
+            print(f"{workers:>7}  {label:<18} {r['throughput']:>9.1f} {r['p50']:>8.2f} {r['p95']:>8.2f} "
+                  f"{r['p99']:>8.2f} {r['max']:>8.2f}  {dict(sorted(r['failures'].items())) or '-'}")
+    app.hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
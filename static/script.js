@@ -20,17 +20,33 @@ document.addEventListener("DOMContentLoaded", () => {
   const closeCreateListModal = document.getElementById("closeCreateListModal");
   const createListForm = document.getElementById("createListForm");
   const createListName = document.getElementById("createListName");
+  const loadMoreBtn = document.getElementById("loadMoreBtn");
+  const markAllDoneBtn = document.getElementById("markAllDoneBtn");
+  const searchInput = document.getElementById("searchInput");
 
   let tasks = [];
   let editingTaskId = null;
   let currentListId = null; // null = Personal; number = collab list id
   let lists = [];
   let listMeta = new Map(); // id -> { is_owner, name }
+  let nextCursor = null; // keyset cursor for the next page of tasks, null = no more
+  let syncToken = null; // change token from the last load, used for GET /tasks?since=
+  let listEvents = null; // EventSource for the current collab list
+  let watchedListId = null;
+  // SSE rows waiting to be merged; a batch on the server sends one event per task, so they
+  // are merged (and counters/search refreshed) once per EVENT_MERGE_MS instead of per event
+  let pendingChanged = [];
+  let pendingDeleted = [];
+  let mergeTimer = null;
+  let listsTimer = null;
+  const EVENT_MERGE_MS = 100;
+  const LISTS_REFRESH_MS = 500;
+  let searchQuery = ''; // non-empty = showing /tasks/search results (best match first)
+  let searchTimer = null;
+  const PAGE_SIZE = 50;
+  const BATCH_MAX_OPS = 500; // TASK_BATCH_MAX_OPS on the server
 
   // Helpers
-  function priorityValue(priority) {
-    return priority === "High" ? 3 : priority === "Mid" ? 2 : 1;
-  }
   function parseDate(value) {
     if (!value) return null;
     const d = new Date(value);
@@ -76,6 +92,16 @@ document.addEventListener("DOMContentLoaded", () => {
     if (!res.ok) throw new Error(`GET ${url} failed: ${res.status}`);
     return res.json();
   }
+  // Like apiGet but also returns the cursor for the next page (if any)
+  async function apiGetPage(url) {
+    const res = await fetch(url, { headers: { 'Accept': 'application/json' } });
+    if (!res.ok) throw new Error(`GET ${url} failed: ${res.status}`);
+    return {
+      data: await res.json(),
+      next: res.headers.get('X-Next-Cursor'),
+      token: res.headers.get('X-Sync-Token'),
+    };
+  }
   async function apiJSON(url, method, body) {
     const res = await fetch(url, {
       method,
@@ -95,24 +121,32 @@ document.addEventListener("DOMContentLoaded", () => {
   //load em lists
   async function loadLists() {
     try {
-      const data = await apiGet('/lists');
+      const data = await apiGet('/lists?include_personal=1');
       lists = data || [];
     } catch (_) {
       lists = [];
     }
     renderListOptions();
   }
+  // "Team (3/10, 2 overdue)" from the counters GET /lists sends along
+  function listLabel(l) {
+    if (!l.total) return l.name;
+    return `${l.name} (${l.done}/${l.total}${l.overdue ? `, ${l.overdue} overdue` : ''})`;
+  }
   function renderListOptions() {
     listSelect.innerHTML = '';
+    // the personal bucket comes first with id null
+    const personal = lists.find(l => l.id === null) || { name: 'Personal' };
     const optPersonal = document.createElement('option');
     optPersonal.value = '';
-    optPersonal.textContent = 'Personal';
+    optPersonal.textContent = listLabel(personal);
     listSelect.appendChild(optPersonal);
     listMeta.clear();
     for (const l of lists) {
+      if (l.id === null) continue;
       const opt = document.createElement('option');
       opt.value = String(l.id);
-      opt.textContent = l.name;
+      opt.textContent = listLabel(l);
       listSelect.appendChild(opt);
       listMeta.set(l.id, { is_owner: !!l.is_owner, name: l.name });
     }
@@ -135,53 +169,183 @@ document.addEventListener("DOMContentLoaded", () => {
   }
 
   // Tasks
+  // Filtering and sorting happen on the server, we just page through the results
+  function tasksUrl(cursor) {
+    if (searchQuery) {
+      const params = new URLSearchParams({ q: searchQuery, limit: PAGE_SIZE });
+      if (currentListId) params.set('list_id', currentListId);
+      if (!showCompleted.checked) params.set('done', '0');
+      if (cursor) params.set('cursor', cursor);
+      return `/tasks/search?${params}`;
+    }
+    const params = new URLSearchParams({ sort: sortBy.value, limit: PAGE_SIZE });
+    if (currentListId) params.set('list_id', currentListId);
+    // archived (long done) tasks only matter when completed ones are shown
+    if (!showCompleted.checked) params.set('done', '0');
+    else params.set('include_archived', '1');
+    if (cursor) params.set('cursor', cursor);
+    return `/tasks?${params}`;
+  }
+  // Live updates from other members of the current collab list (Server-Sent Events).
+  // EventSource reconnects by itself and sends Last-Event-ID so missed events get replayed.
+  function watchList(listId) {
+    if (listId === watchedListId) return;
+    if (listEvents) listEvents.close();
+    listEvents = null;
+    watchedListId = listId;
+    clearTimeout(mergeTimer);
+    mergeTimer = null;
+    pendingChanged = [];
+    pendingDeleted = [];
+    if (!listId || typeof EventSource === 'undefined') return;
+    listEvents = new EventSource(`/lists/${listId}/events`);
+    listEvents.addEventListener('task', (e) => queueMerge([JSON.parse(e.data)], []));
+    listEvents.addEventListener('task_deleted', (e) => queueMerge([], [JSON.parse(e.data).id]));
+    listEvents.addEventListener('reminder', (e) => remind(JSON.parse(e.data)));
+    // server dropped events for us (we fell behind or it restarted), catch up via delta sync
+    listEvents.addEventListener('resync', () => syncTasks());
+    listEvents.addEventListener('members', () => {
+      if (shareModal.style.display === 'block') refreshShareModal();
+    });
+    listEvents.addEventListener('revoked', async () => {
+      watchList(null);
+      await loadLists();
+      await loadTasks();
+    });
+  }
+  function queueMerge(changed, deletedIds) {
+    pendingChanged.push(...changed);
+    pendingDeleted.push(...deletedIds);
+    if (mergeTimer) return;
+    mergeTimer = setTimeout(() => {
+      const rows = pendingChanged;
+      const ids = pendingDeleted;
+      mergeTimer = null;
+      pendingChanged = [];
+      pendingDeleted = [];
+      mergeTasks(rows, ids);
+    }, EVENT_MERGE_MS);
+  }
+  // list counters after task changes, at most one GET /lists per LISTS_REFRESH_MS
+  function refreshLists() {
+    if (listsTimer) return;
+    listsTimer = setTimeout(() => {
+      listsTimer = null;
+      loadLists();
+    }, LISTS_REFRESH_MS);
+  }
+  // the server sends a reminder when an open task's due time passes: personal tasks on
+  // /reminders/events, list tasks on the list's own stream (only the open list is watched)
+  function remind(task) {
+    showCustomAlert(`"${task.title}" is due now.`);
+  }
+  if (typeof EventSource !== 'undefined') {
+    new EventSource('/reminders/events').addEventListener('reminder', (e) => remind(JSON.parse(e.data)));
+  }
   async function loadTasks() {
+    watchList(currentListId);
+    try {
+      const page = await apiGetPage(tasksUrl());
+      tasks = (page.data || []).map(t => ({ ...t, done: Boolean(t.done) }));
+      nextCursor = page.next;
+      syncToken = page.token;
+      renderTasks();
+    } catch (err) {
+      console.error(err);
+      await showCustomAlert('Failed to load tasks.');
+    }
+  }
+  async function loadMoreTasks() {
+    if (!nextCursor) return;
     try {
-      const url = currentListId ? `/tasks?list_id=${currentListId}` : '/tasks';
-      const data = await apiGet(url);
-      tasks = (data || []).map(t => ({ ...t, done: t.done ? Boolean(t.done) : Boolean(t.done) }));
+      const page = await apiGetPage(tasksUrl(nextCursor));
+      tasks = tasks.concat((page.data || []).map(t => ({ ...t, done: Boolean(t.done) })));
+      nextCursor = page.next;
       renderTasks();
     } catch (err) {
       console.error(err);
       await showCustomAlert('Failed to load tasks.');
     }
   }
+  // Same ordering as the server's sort keys (TASK_SORT_KEYS in app.py)
+  function sortKey(t) {
+    if (sortBy.value === 'priority') return t.priority === 'High' ? 0 : t.priority === 'Mid' ? 1 : 2;
+    return (sortBy.value === 'dueDate' ? t.dueDate : t.createdAt) || '';
+  }
+  function compareTasks(a, b) {
+    const ka = sortKey(a);
+    const kb = sortKey(b);
+    if (ka < kb) return -1;
+    if (ka > kb) return 1;
+    return a.id - b.id;
+  }
+  // Merge changed/deleted rows into the loaded tasks instead of refetching everything.
+  // New rows that sort past the last loaded one are left for "Load more".
+  function mergeTasks(changed, deletedIds) {
+    // search results are ranked by the server, just run the search again
+    if (searchQuery) return loadTasks();
+    const deleted = new Set(deletedIds || []);
+    const last = tasks[tasks.length - 1];
+    const byId = new Map(tasks.filter(t => !deleted.has(t.id)).map(t => [t.id, t]));
+    for (const row of changed || []) {
+      const t = { ...row, done: Boolean(row.done) };
+      if (byId.has(t.id) || !nextCursor || !last || compareTasks(t, last) <= 0) byId.set(t.id, t);
+    }
+    tasks = Array.from(byId.values()).sort(compareTasks);
+    renderTasks();
+    refreshLists(); // counters changed too
+  }
+  // Pull only what changed since the last load/sync
+  async function syncTasks() {
+    if (!syncToken || searchQuery) return loadTasks();
+    try {
+      const params = new URLSearchParams({ since: syncToken });
+      if (currentListId) params.set('list_id', currentListId);
+      const delta = await apiGet(`/tasks?${params}`);
+      syncToken = delta.token;
+      mergeTasks(delta.changed, delta.deleted);
+    } catch (err) {
+      // includes 410: the token is older than the kept tombstones, only a reload is exact
+      console.error(err);
+      await loadTasks();
+    }
+  }
+  // Rows returned by POST /tasks/batch
+  function applyBatchResult(res) {
+    mergeTasks(res.tasks, res.deleted);
+  }
   function renderTasks() {
     taskList.innerHTML = '';
-    let filtered = tasks.filter(t => showCompleted.checked || !t.done);
-    filtered.sort((a, b) => {
-      if (sortBy.value === 'dueDate') {
-        const da = parseDate(a.dueDate);
-        const db = parseDate(b.dueDate);
-        return (da ? da.getTime() : 0) - (db ? db.getTime() : 0);
-      }
-      if (sortBy.value === 'priority') return priorityValue(b.priority) - priorityValue(a.priority);
-      const ca = parseDate(a.createdAt);
-      const cb = parseDate(b.createdAt);
-      return (ca ? ca.getTime() : 0) - (cb ? cb.getTime() : 0);
-    });
+    loadMoreBtn.style.display = nextCursor ? '' : 'none';
+    // still hide tasks checked off locally while "Show Completed" is off
+    const filtered = tasks.filter(t => showCompleted.checked || !t.done);
     for (const task of filtered) {
       const li = document.createElement('li');
       li.classList.add(`priority-${task.priority}`);
       if (task.done) li.classList.add('done');
+      // archived tasks can still be edited/deleted, the server moves them back first
+      const actions = `${task.archived ? '<span class="meta-block">Archived</span>' : ''}
+          <input type="checkbox" class="checkbox-done" ${task.done ? 'checked' : ''}>
+          <button class="btn btn-edit">Edit</button>
+          <button class="btn btn-delete">Delete</button>`;
       li.innerHTML = `
         <div style="flex: 1">
-          <strong>${task.title}</strong>
+          <strong>${task.match ? task.match.title : task.title}</strong>
           <div class="meta-block">Due: ${formatDateMMDDYYYY(task.dueDate)} ${task.dueTime || ''} | Priority: ${task.priority}</div>
-          <div class="desc">${task.description || ''}</div>
+          <div class="desc">${task.match ? task.match.description : (task.description || '')}</div>
           <div class="date-created">Created: ${formatDateTimeMMDDYYYY(task.createdAt)}</div>
         </div>
         <div>
-          <input type="checkbox" class="checkbox-done" ${task.done ? 'checked' : ''}>
-          <button class="btn btn-edit">Edit</button>
-          <button class="btn btn-delete">Delete</button>
+          ${actions}
         </div>
       `;
       li.querySelector('.checkbox-done').addEventListener('change', async (e) => {
         try {
           await apiJSON(`/tasks/${task.id}`, 'PATCH', { done: e.target.checked ? 1 : 0 });
           task.done = e.target.checked;
+          task.archived = 0;
           renderTasks();
+          refreshLists();
         } catch (err) {
           console.error(err);
           await showCustomAlert('Failed to update task.');
@@ -201,7 +365,7 @@ document.addEventListener("DOMContentLoaded", () => {
         if (!ok) return;
         try {
           await apiJSON(`/tasks/${task.id}`, 'DELETE');
-          await loadTasks();
+          await syncTasks();
         } catch (err) {
           console.error(err);
           await showCustomAlert('Failed to delete task.');
@@ -229,7 +393,7 @@ document.addEventListener("DOMContentLoaded", () => {
         await apiJSON('/tasks', 'POST', payload);
       }
       closeModal();
-      await loadTasks();
+      await syncTasks();
     } catch (err) {
       console.error(err);
       await showCustomAlert('Failed to save task.');
@@ -275,14 +439,63 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   });
 
-  // Re-render when sort or checkbox changes
-  sortBy.addEventListener('change', renderTasks);
-  showCompleted.addEventListener('change', renderTasks);
+  // Re-query when sort or checkbox changes
+  sortBy.addEventListener('change', loadTasks);
+  // search as you type, one request once typing pauses
+  searchInput.addEventListener('input', () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => {
+      const q = searchInput.value.trim();
+      if (q === searchQuery) return;
+      searchQuery = q;
+      syncToken = null;
+      loadTasks();
+    }, 200);
+  });
+  showCompleted.addEventListener('change', loadTasks);
+  loadMoreBtn.addEventListener('click', loadMoreTasks);
+
+  // Bulk actions go through batch requests of at most BATCH_MAX_OPS ops each
+  markAllDoneBtn.addEventListener('click', async () => {
+    const ops = tasks.filter(t => !t.done).map(t => ({ op: 'update', id: t.id, done: 1 }));
+    if (!ops.length) return;
+    try {
+      for (let i = 0; i < ops.length; i += BATCH_MAX_OPS) {
+        applyBatchResult(await apiJSON('/tasks/batch', 'POST', { ops: ops.slice(i, i + BATCH_MAX_OPS) }));
+      }
+    } catch (err) {
+      console.error(err);
+      await showCustomAlert('Failed to update tasks.');
+    }
+  });
 
   // Init
+  // home() embeds the lists and the first page of tasks, use them instead of fetching if they
+  // match what we'd ask for (the browser may have restored other form values)
+  function hydrate() {
+    const el = document.getElementById('initialState');
+    if (!el) return false;
+    let state;
+    try {
+      state = JSON.parse(el.textContent);
+    } catch (_) {
+      return false;
+    }
+    const page = state.tasks;
+    if (!page || page.sort !== sortBy.value || Number(page.limit) !== PAGE_SIZE
+        || (page.done === '0') === showCompleted.checked || searchInput.value.trim()) return false;
+    lists = state.lists || [];
+    renderListOptions();
+    tasks = page.items.map(t => ({ ...t, done: Boolean(t.done) }));
+    nextCursor = page.next;
+    syncToken = page.token;
+    watchList(null);
+    renderTasks();
+    return true;
+  }
   (async function init() {
-    await loadLists();
-    await loadTasks();
+    if (hydrate()) return;
+    await Promise.all([loadLists(), loadTasks()]);
   })();
 
   // --- Sharing modal ---